@@ -16,6 +16,7 @@ import uuid
 import zipfile
 import contextlib
 from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 
@@ -184,17 +185,26 @@ WORKFLOWS = {
 # ---------------------------------------------------------------------------
 # Process manager
 # ---------------------------------------------------------------------------
+@dataclass(slots=True)
+class ProcInfo:
+    """Registry entry for a running (or finished) workflow sub-process."""
+
+    proc: subprocess.Popen
+    started: str
+    pid: int
+
+
 class ProcessManager:
     """Track running scraper sub-processes."""
 
     def __init__(self):
-        self._procs: dict[str, dict] = {}
+        self._procs: dict[str, ProcInfo] = {}
         self._logs: dict[str, deque] = {}
         self._lock = threading.Lock()
 
     def start(self, key: str, env_overrides: dict | None = None) -> dict:
         with self._lock:
-            if key in self._procs and self._procs[key]["proc"].poll() is None:
+            if key in self._procs and self._procs[key].proc.poll() is None:
                 return {"error": "already running"}
 
             wf = WORKFLOWS[key]
@@ -219,11 +229,7 @@ class ProcessManager:
 
             log_buf = deque(maxlen=200)
             self._logs[key] = log_buf
-            self._procs[key] = {
-                "proc": proc,
-                "started": datetime.now().isoformat(),
-                "pid": proc.pid,
-            }
+            self._procs[key] = ProcInfo(proc, datetime.now().isoformat(), proc.pid)
 
             # Background thread to read output
             t = threading.Thread(target=self._reader, args=(key, proc, log_buf), daemon=True)
@@ -241,13 +247,13 @@ class ProcessManager:
     def stop(self, key: str) -> dict:
         with self._lock:
             info = self._procs.get(key)
-            if not info or info["proc"].poll() is not None:
+            if not info or info.proc.poll() is not None:
                 return {"status": "not_running"}
             try:
-                os.killpg(os.getpgid(info["proc"].pid), signal.SIGTERM)
+                os.killpg(os.getpgid(info.proc.pid), signal.SIGTERM)
             except Exception:
-                info["proc"].terminate()
-            info["proc"].wait(timeout=5)
+                info.proc.terminate()
+            info.proc.wait(timeout=5)
             return {"status": "stopped"}
 
     def status(self, key: str) -> dict:
@@ -255,16 +261,16 @@ class ProcessManager:
         if not info:
             return {"state": "idle", "logs": []}
 
-        running = info["proc"].poll() is None
-        return_code = info["proc"].returncode
+        running = info.proc.poll() is None
+        return_code = info.proc.returncode
 
         state = "running" if running else ("completed" if return_code == 0 else "error")
 
         logs = list(self._logs.get(key, []))
         return {
             "state": state,
-            "pid": info["pid"],
-            "started": info["started"],
+            "pid": info.pid,
+            "started": info.started,
             "return_code": return_code,
             "logs": logs[-80:],
         }
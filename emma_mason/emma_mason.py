@@ -2,21 +2,31 @@ import os
 import csv
 import time
 import sys
-import gc
 import threading
-from curl_cffi import requests
+from curl_cffi import requests, CurlOpt
+import io
 import re
-import json
-from typing import Optional, List, Dict, Any
+import orjson
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 from datetime import datetime, timezone
-from xml.etree import ElementTree as ET
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from bs4 import BeautifulSoup
+from lxml import etree
+from concurrent.futures import ThreadPoolExecutor
+import lxml.html
 from urllib.parse import urlparse
 import urllib3
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+_SCRIPT_SELF  = re.compile(rb'<script[^>]*/>')
+_SCRIPT_BLOCK = re.compile(rb'<script[^>]*>.*?</script>', re.DOTALL)
+_LDJSON_RE    = re.compile(
+    rb'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.DOTALL | re.IGNORECASE,
+)
+_URL_RE       = re.compile(r'^([A-Za-z][A-Za-z0-9+.-]*)://([^/?#]*)([^?#;]*)')
+_SITEMAP_NS   = "http://www.sitemaps.org/schemas/sitemap/0.9"
+_LOC_TAGS     = (f"{{{_SITEMAP_NS}}}loc", "loc")
+
 
 class emmamasonScraper:
 
@@ -30,8 +40,10 @@ class emmamasonScraper:
         self.sitemap_offset       = int(os.getenv("SITEMAP_OFFSET", "0"))
         self.max_sitemaps         = int(os.getenv("MAX_SITEMAPS", "0"))
         self.max_urls_per_sitemap = int(os.getenv("MAX_URLS_PER_SITEMAP", "0"))
-        self.max_workers          = int(os.getenv("MAX_WORKERS", "4"))
+        # I/O-bound: workers mostly sit in recv(), so network latency (not cores) sets this
+        self.max_workers          = int(os.getenv("MAX_WORKERS", "32"))
         self.request_delay        = float(os.getenv("REQUEST_DELAY", "1.0"))
+        self.max_queue_size       = int(os.getenv("MAX_QUEUE_SIZE", "1000"))
 
         self.output_dir   = "media/output/scrapping/emmamason"
         self.failure_dir  = "media/output/scrapping/failure_csv"
@@ -59,8 +71,17 @@ class emmamasonScraper:
         ]
 
         self.csv_lock  = threading.Lock()
+        self.row_local   = threading.local()
+        self.row_buffers = []  # every worker's pending rows, drained once the pool exits
+        self.row_batch   = 16  # small: rows still buffered when a job is killed outright are lost
         self.fail_lock = threading.Lock()
-        self.seen      = set()
+        self.rate_lock = threading.Lock()
+        self.log_files      = []
+        self.fail_writer    = None
+        self.skipped_writer = None
+        os.makedirs(self.failure_dir, exist_ok=True)
+        self.next_slot = 0.0
+        self.seen      = set()  # 64-bit hashes of cleaned URLs, not the strings
         self.stats     = {
             "sitemaps_processed": 0,
             "urls_processed":     0,
@@ -69,7 +90,12 @@ class emmamasonScraper:
             "plp_urls_skipped":     0,
         }
 
-        self.session = requests.Session()
+        # curl_cffi keeps one curl handle per thread; size each handle's connection
+        # cache for the worker pool and keep idle sockets alive between requests
+        self.session = requests.Session(curl_options={
+            CurlOpt.MAXCONNECTS:   self.max_workers,
+            CurlOpt.TCP_KEEPALIVE: 1,
+        })
         self.session.headers.update({
             "method": "GET",
             "scheme": "https",
@@ -77,6 +103,7 @@ class emmamasonScraper:
             "Accept-Encoding": "gzip, deflate, br, zstd",
             "Accept-Language": "en-US,en;q=0.8",
             "Cache-Control": "max-age=0",
+            "Connection": "keep-alive",
             "Priority": "u=0, i",
             "Sec-Ch-Ua": '"Brave";v="125", "Chromium";v="125", "Not.A/Brand";v="24"',
             "Sec-Ch-Ua-Mobile": "?0",
@@ -102,47 +129,21 @@ class emmamasonScraper:
     #  HTTP
     # ============================================================
 
-    def http_get(self, url: str, is_json: bool = False) -> Optional[str]:
-        """GET with up to 3 retries. Switches headers for JSON vs HTML requests."""
+    def http_get(self, url: str) -> Optional[bytes]:
+        """GET with up to 3 retries using the session's headers."""
         for attempt in range(3):
             try:
-                if is_json:
-                    headers = {
-                        "method": "GET",
-                        "scheme": "https",
-                        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-                        "Accept-Encoding": "gzip, deflate, br, zstd",
-                        "Accept-Language": "en-US,en;q=0.8",
-                        "Cache-Control": "max-age=0",
-                        "Priority": "u=0, i",
-                        "Sec-Ch-Ua": '"Brave";v="125", "Chromium";v="125", "Not.A/Brand";v="24"',
-                        "Sec-Ch-Ua-Mobile": "?0",
-                        "Sec-Ch-Ua-Platform": '"Linux"',
-                        "Sec-Fetch-Dest": "empty",
-                        "Sec-Fetch-Mode": "navigate",
-                        "Sec-Fetch-Site": "same-origin",
-                        "Sec-Gpc": "1",
-                        "Upgrade-Insecure-Requests": "1",
-                        "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
-                    }
-                    r = self.session.get(
-                        url,
-                        headers=headers,
-                        timeout=15,
-                        verify=True,
-                        impersonate="chrome124",
-                    )
-                else:
-                    r = self.session.get(
-                        url,
-                        timeout=15,
-                        verify=True,
-                        impersonate="chrome124",
-                    )
+                r = self.session.get(
+                    url,
+                    timeout=15,
+                    verify=True,
+                    impersonate="chrome124",
+                )
 
                 if r.status_code == 200:
                     self.log(f"Success: {url}", "DEBUG")
-                    return r.text
+                    # Raw bytes: the JSON-LD regex and lxml both work on bytes
+                    return r.content
 
                 self.log(f"Status {r.status_code} for {url}", "WARNING")
                 if r.status_code == 429:
@@ -157,16 +158,27 @@ class emmamasonScraper:
 
         return None
 
+    def throttle(self):
+        """Space product requests request_delay apart across all workers combined."""
+        if self.request_delay <= 0:
+            return
+        with self.rate_lock:
+            now  = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.request_delay
+        if slot > now:
+            time.sleep(slot - now)
+
     # ============================================================
     #  Sitemap
     # ============================================================
 
-    def load_xml(self, url: str) -> Optional[ET.Element]:
-        """Fetch and parse an XML sitemap. Strips <script/> before parsing."""
+    def load_xml(self, url: str) -> Optional[bytes]:
+        """Fetch an XML sitemap as bytes. Strips <script/> so it parses cleanly."""
         data = None
         for attempt in range(3):
             try:
-                data = self.http_get(url, is_json=False)
+                data = self.http_get(url)
                 if data:
                     break
             except Exception as e:
@@ -179,58 +191,65 @@ class emmamasonScraper:
 
         # emmamason injects <script/> into the sitemap index which breaks XML parsing
         # Simply strip it out before parsing — same as ovr.py approach
-        data = re.sub(r'<script[^>]*/>', '', data)
-        data = re.sub(r'<script[^>]*>.*?</script>', '', data, flags=re.DOTALL)
+        data = _SCRIPT_SELF.sub(b'', data)
+        data = _SCRIPT_BLOCK.sub(b'', data)
+        if b"<?xml" not in data[:100]:
+            data = b'<?xml version="1.0" encoding="UTF-8"?>\n' + data
+        return data
+
+    def iter_locs(self, data: bytes, url: str) -> Iterator[str]:
+        """Stream <loc> texts out of sitemap XML, dropping each entry once read."""
+        ctx = etree.iterparse(io.BytesIO(data), events=("end",), tag=_LOC_TAGS)
         try:
-            if "<?xml" not in data[:100]:
-                data = '<?xml version="1.0" encoding="UTF-8"?>\n' + data
-            return ET.fromstring(data)
-        except ET.ParseError as e:
+            for _, elem in ctx:
+                if elem.text:
+                    yield elem.text.strip()
+                elem.clear()
+                entry = elem.getparent()  # <url> / <sitemap> wrapper
+                if entry is not None:
+                    while entry.getprevious() is not None:
+                        del entry.getparent()[0]
+        except etree.XMLSyntaxError as e:
             self.log(f"XML parse error for {url}: {e}", "ERROR")
-            return None
 
     def get_child_sitemaps(self, index_url: str) -> List[str]:
         """Parse sitemap index and return list of child sitemap URLs."""
-        ns    = {"ns": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-        index = self.load_xml(index_url)
-        if index is None:
+        data = self.load_xml(index_url)
+        if not data:
             return []
 
-        for path in [".//ns:sitemap/ns:loc", ".//sitemap/loc", ".//loc"]:
-            elements = index.findall(path, ns) if "ns:" in path else index.findall(path)
-            if elements:
-                sitemaps = [e.text.strip() for e in elements if e.text]
-                if sitemaps:
-                    self.log(f"Found {len(sitemaps)} child sitemaps", "INFO")
-                    return sitemaps
+        sitemaps = [loc for loc in self.iter_locs(data, index_url) if loc]
+        if sitemaps:
+            self.log(f"Found {len(sitemaps)} child sitemaps", "INFO")
+            return sitemaps
 
         self.log("No child sitemaps found", "WARNING")
         return []
 
     def get_product_urls(self, sitemap_url: str) -> List[str]:
         """Parse a product sitemap and return only emmamason /ip/ URLs."""
-        ns  = {"ns": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-        xml = self.load_xml(sitemap_url)
-        if not xml:
+        data = self.load_xml(sitemap_url)
+        if not data:
             return []
 
-        for path in [".//ns:url/ns:loc", ".//url/loc", ".//loc"]:
-            elements = xml.findall(path, ns) if "ns:" in path else xml.findall(path)
-            if elements:
-                urls = [e.text.strip() for e in elements if e.text]
-                if urls:
-                    return urls
-
-        return []
+        return [loc for loc in self.iter_locs(data, sitemap_url) if loc]
 
     # ============================================================
     #  Helpers
     # ============================================================
 
+    def split_url(self, url: str) -> Tuple[str, str, str]:
+        """(scheme, netloc, path) via one regex match; urlparse only for odd shapes."""
+        m = _URL_RE.match(url)
+        if m:
+            return m.group(1), m.group(2), m.group(3)
+        parsed = urlparse(url)
+        return parsed.scheme, parsed.netloc, parsed.path
+
     def clean_url(self, url: str) -> str:
         """Strip query params and trailing slashes."""
-        parsed = urlparse(url)
-        return f"{parsed.scheme}://{parsed.netloc}{parsed.path.rstrip('/')}"
+        scheme, netloc, path = self.split_url(url)
+        return f"{scheme}://{netloc}{path.rstrip('/')}"
 
     def normalize_image(self, url: str) -> str:
         """Make image URL absolute."""
@@ -248,77 +267,76 @@ class emmamasonScraper:
     #  Product Extraction
     # ============================================================
 
-    def extract_emmamason_data(self, soup: BeautifulSoup, url: str) -> List[Dict]:
-        """Parse JSON-LD blocks from a emmamason page. Returns one dict per data."""
-        # product_id = self.extract_product_id(url)
-        results: List[Dict] = []
+    def is_product_ld(self, data: Any) -> bool:
+        """True for a JSON-LD dict whose @type is (or includes) Product."""
+        if not isinstance(data, dict):
+            return False
+        ld_type = data.get("@type")
+        return ld_type == "Product" or (isinstance(ld_type, list) and "Product" in ld_type)
 
-        for script in soup.find_all("script", type="application/ld+json"):
+    def extract_emmamason_data(self, blocks: List[Any], url: str) -> Optional[Dict]:
+        """Return the first Product JSON-LD block on a emmamason page as a row dict."""
+        for raw in blocks:
             try:
-                raw = script.string
                 if not raw:
                     continue
-                data = json.loads(raw)
+                data = orjson.loads(raw)
 
                 if isinstance(data, list):
-                    data = data[0]
-                if not isinstance(data, dict):
+                    data = next((d for d in data if self.is_product_ld(d)), None)
+                # BreadcrumbList / WebPage / Organization blocks are skipped before any field work
+                if not self.is_product_ld(data):
                     continue
 
-               
-
+                _get = data.get
+                name, sku, mpn, gtin, desc, material, images, brand_raw, offers = (
+                    _get(k, "") for k in (
+                        "name", "sku", "mpn", "gtin13", "description",
+                        "material", "image", "brand", "offers",
+                    )
+                )
 
-                selected_offer = data.get("offers", {})
                 # ---- Image ----
-                images     = data.get("image", "")
                 main_image = images[0] if isinstance(images, list) else images or ""
 
                 # ---- Price ----
-                price = (
-                    selected_offer.get("price", "")
-                    or selected_offer.get("lowPrice", "")
-                    or (data.get("offers", {}).get("price", "")
-                        if isinstance(data.get("offers"), dict) else "")
-                )
+                offers = offers or {}
+                price  = offers.get("price", "") or offers.get("lowPrice", "")
 
                 # ---- Brand ----
-                brand_raw = data.get("brand", {})
-                brand     = brand_raw.get("name", "") if isinstance(brand_raw, dict) else str(brand_raw)
+                brand = brand_raw.get("name", "") if isinstance(brand_raw, dict) else str(brand_raw)
 
-                results.append({
+                return {
                     "competitor_product_id": "",
-                    "comp_received_name":    data.get("name", ""),
-                    "comp_received_sku":     data.get("sku", ""),
+                    "comp_received_name":    name,
+                    "comp_received_sku":     sku,
                     "brand":                 brand,
-                    "mpn":                   data.get("mpn", ""),
+                    "mpn":                   mpn,
                     "category":              "",
                     "category_url":          "",
-                    "gtin":                  data.get("gtin13", ""),
+                    "gtin":                  gtin,
                     "quantity":              1,
                     "status":                "In Stock",
                     "competitor_price":      price,
-                    "group_attr_1":          data.get("description", ""),
-                    "group_attr_2":          data.get("material", ""),
+                    "group_attr_1":          desc,
+                    "group_attr_2":          material,
                     "main_image":            self.normalize_image(main_image),
                     "competitor_url":        url,
                     "scraped_date":          self.scraped_date,
-                })
-
-                if results:
-                    return results
+                }
 
-            except (json.JSONDecodeError, AttributeError) as e:
+            except (orjson.JSONDecodeError, AttributeError) as e:
                 self.log(f"JSON-LD parse error: {e}", "WARNING")
                 continue
 
-        return results
+        return None
 
     # ============================================================
     #  CSV Write
     # ============================================================
 
-    def write_row(self, writer: csv.writer, product: Dict):
-        """Thread-safe write of one product row to CSV."""
+    def write_row(self, out, product: Dict):
+        """Queue one product row in this thread's buffer; flush every row_batch rows."""
         row = [
             product["competitor_url"],
             product["competitor_product_id"],
@@ -337,79 +355,114 @@ class emmamasonScraper:
             product["status"],
             product["scraped_date"],
         ]
+        buf = getattr(self.row_local, "rows", None)
+        if buf is None:
+            buf = self.row_local.rows = []
+            with self.csv_lock:
+                self.row_buffers.append(buf)
+        buf.append(row)
+        if len(buf) >= self.row_batch:
+            self.flush_rows(out, buf)
+
+    def flush_rows(self, out, buf: List[list]):
+        """Format buffered rows outside the lock, then write them in one call."""
+        if not buf:
+            return
+        chunk = io.StringIO()
+        csv.writer(chunk).writerows(buf)
+        buf.clear()
         with self.csv_lock:
-            writer.writerow(row)
+            out.write(chunk.getvalue())
+
+    def open_log_csv(self, name: str, header: List[str]):
+        """Open an append-mode CSV under failure_dir once and keep its writer."""
+        path        = os.path.join(self.failure_dir, name)
+        file_exists = os.path.isfile(path)
+        fh = open(path, "a", newline="", encoding="utf-8", buffering=1 << 16)
+        self.log_files.append(fh)
+        w = csv.writer(fh)
+        if not file_exists:
+            w.writerow(header)
+        return w
 
     def log_failure(self, url: str, reason: str):
         """Append a failed URL to the failure CSV."""
-        os.makedirs(self.failure_dir, exist_ok=True)
-        failure_path = os.path.join(self.failure_dir, "emmamason_failures.csv")
-        file_exists  = os.path.isfile(failure_path)
         with self.fail_lock:
-            with open(failure_path, "a", newline="", encoding="utf-8") as f:
-                w = csv.writer(f)
-                if not file_exists:
-                    w.writerow(["URL", "Reason", "Timestamp"])
-                w.writerow([url, reason, self.scraped_date])
+            if self.fail_writer is None:
+                self.fail_writer = self.open_log_csv(
+                    "emmamason_failures.csv", ["URL", "Reason", "Timestamp"]
+                )
+            self.fail_writer.writerow([url, reason, self.scraped_date])
 
     def log_skipped_plp(self, url: str):
         """Append a skipped PLP URL to the per-chunk skipped CSV."""
-        os.makedirs(self.failure_dir, exist_ok=True)
-        skipped_path = os.path.join(self.failure_dir, self.skipped_plp_csv)
-        file_exists  = os.path.isfile(skipped_path)
         with self.fail_lock:
-            with open(skipped_path, "a", newline="", encoding="utf-8") as f:
-                w = csv.writer(f)
-                if not file_exists:
-                    w.writerow(["URL", "Reason", "Timestamp", "Sitemap Offset"])
-                w.writerow([url, "PLP URL skipped", self.scraped_date, self.sitemap_offset])
+            if self.skipped_writer is None:
+                self.skipped_writer = self.open_log_csv(
+                    self.skipped_plp_csv, ["URL", "Reason", "Timestamp", "Sitemap Offset"]
+                )
+            self.skipped_writer.writerow([url, "PLP URL skipped", self.scraped_date, self.sitemap_offset])
+
+    def close(self):
+        """Flush and close the failure/skipped CSV handles."""
+        with self.fail_lock:
+            for fh in self.log_files:
+                fh.close()
+            self.log_files.clear()
+            self.fail_writer    = None
+            self.skipped_writer = None
 
     # ============================================================
     #  Process Single Product
     # ============================================================
 
     def _is_plp_url(self, url: str) -> bool:
-        parsed_url = urlparse(url)
-        path = parsed_url.path.strip('/')
-        
-        if not path:
-            return True
-        return '/' in path
-
-    def process_product(self, product_url: str, writer: csv.writer):
-        """Fetch, extract, and save one emmamason product URL."""
-        if self._is_plp_url(product_url):
-            self.stats["plp_urls_skipped"] += 1
-            self.log_skipped_plp(product_url)
-            return
-
-        base_url = self.clean_url(product_url)
-
-        if base_url in self.seen:
-            return
-        self.seen.add(base_url)
-
+        path = self.split_url(url)[2].strip('/')
+        return not path or '/' in path
+
+    def select_product_urls(self, urls: List[str]) -> List[str]:
+        """Drop PLP and already-seen URLs before scheduling; marks the rest as seen."""
+        fresh: List[str] = []
+        for url in urls:
+            # Same checks as _is_plp_url/clean_url, but from a single split of the URL
+            scheme, netloc, path = self.split_url(url)
+            slug = path.strip('/')
+            if not slug or '/' in slug:
+                self.stats["plp_urls_skipped"] += 1
+                self.log_skipped_plp(url)
+                continue
+            base_url = f"{scheme}://{netloc}{path.rstrip('/')}"
+            key      = hash(base_url)
+            if key not in self.seen:
+                self.seen.add(key)
+                fresh.append(base_url)
+        return fresh
+
+    def process_product(self, base_url: str, out):
+        """Fetch, extract, and save one (already cleaned and de-duplicated) product URL."""
         self.log(f"Processing: {base_url}", "DEBUG")
 
-        html = self.http_get(base_url, is_json=False)
+        self.throttle()
+        html = self.http_get(base_url)
         if not html:
             self.stats["errors"] += 1
             self.log_failure(base_url, "HTTP fetch failed")
             return
 
-        soup     = BeautifulSoup(html, "html.parser")
-        products = self.extract_emmamason_data(soup, base_url)
+        # Fast path: regex the JSON-LD out of the raw bytes; only build a tree on a miss
+        blocks = _LDJSON_RE.findall(html)
+        if not blocks:
+            blocks = lxml.html.fromstring(html).xpath('//script[@type="application/ld+json"]/text()')
+        product = self.extract_emmamason_data(blocks, base_url)
 
-        if not products:
+        if not product:
             self.stats["errors"] += 1
             self.log_failure(base_url, "No product data found in JSON-LD")
             return
 
-        for product in products:
-            if not product.get("comp_received_name"):
-                continue
+        if product.get("comp_received_name"):
             try:
-                self.write_row(writer, product)
+                self.write_row(out, product)
                 self.stats["products_fetched"] += 1
                 self.log(
                     f"Saved [{product['competitor_product_id']}] "
@@ -419,7 +472,6 @@ class emmamasonScraper:
                 # self.log(f"Row write error for {product_id}: {e}", "ERROR")
                 self.stats["errors"] += 1
 
-        time.sleep(self.request_delay)
         self.stats["urls_processed"] += 1
 
     # ============================================================
@@ -458,37 +510,50 @@ class emmamasonScraper:
         os.makedirs(self.output_dir, exist_ok=True)
         output_path = os.path.join(self.output_dir, self.output_csv)
 
-        with open(output_path, "w", newline="", encoding="utf-8") as f:
+        with open(output_path, "w", newline="", encoding="utf-8", buffering=1 << 20) as f:
             writer = csv.writer(f)
             writer.writerow(self.csv_header)
 
-            for sitemap_url in sitemaps_to_run:
-                self.stats["sitemaps_processed"] += 1
-                self.log(f"Sitemap {self.stats['sitemaps_processed']}/{len(sitemaps_to_run)}: {sitemap_url}")
-
-                urls = self.get_product_urls(sitemap_url)
-                if not urls:
-                    continue
-
-                if self.max_urls_per_sitemap > 0:
-                    self.log(f"Limiting to {self.max_urls_per_sitemap} of {len(urls)} URLs")
-                    urls = urls[:self.max_urls_per_sitemap]
-                else:
-                    self.log(f"Found {len(urls)} product URLs")
-
+            # Bound the URLs queued ahead of the workers so memory stays flat across sitemaps
+            pending = threading.Semaphore(self.max_queue_size)
+
+            def on_done(future):
+                pending.release()
+                exc = future.exception()
+                if exc is not None:
+                    self.log(f"Thread error: {exc}", "ERROR")
+                    self.stats["errors"] += 1
+
+            # One pool for the whole run: workers (and their keep-alive handles) stay warm
+            # across sitemap boundaries instead of draining and respawning each time.
+            # Threads rather than asyncio: curl_cffi's sync Session gives each worker its
+            # own keep-alive handle, and throttle() caps the request rate anyway, so
+            # extra in-flight sockets would only wait on the throttle.
+            try:
                 with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                    futures = [
-                        executor.submit(self.process_product, url, writer)
-                        for url in urls
-                    ]
-                    for future in as_completed(futures):
-                        try:
-                            future.result()
-                        except Exception as e:
-                            self.log(f"Thread error: {e}", "ERROR")
-                            self.stats["errors"] += 1
-
-                gc.collect()
+                    for sitemap_url in sitemaps_to_run:
+                        self.stats["sitemaps_processed"] += 1
+                        self.log(f"Sitemap {self.stats['sitemaps_processed']}/{len(sitemaps_to_run)}: {sitemap_url}")
+
+                        urls = self.get_product_urls(sitemap_url)
+                        if not urls:
+                            continue
+
+                        if self.max_urls_per_sitemap > 0:
+                            self.log(f"Limiting to {self.max_urls_per_sitemap} of {len(urls)} URLs")
+                            urls = urls[:self.max_urls_per_sitemap]
+                        else:
+                            self.log(f"Found {len(urls)} product URLs")
+
+                        for url in self.select_product_urls(urls):
+                            pending.acquire()
+                            executor.submit(self.process_product, url, f).add_done_callback(on_done)
+            finally:
+                # Pool is drained (the with block waits for running workers even when
+                # interrupted), so no worker is touching its buffer any more
+                for buf in self.row_buffers:
+                    self.flush_rows(f, buf)
+                self.row_buffers.clear()
 
         self.log("=" * 60)
         self.log("SCRAPING COMPLETE")
@@ -513,4 +578,8 @@ if __name__ == "__main__":
         sys.stderr.write("[ERROR] CURR_URL environment variable is required\n")
         sys.exit(1)
 
-    emmamasonScraper().run()
+    scraper = emmamasonScraper()
+    try:
+        scraper.run()
+    finally:
+        scraper.close()
@@ -1,22 +1,32 @@
 import os
-import csv
 import time
 import sys
 import gc
 import threading
+import atexit
+import queue
 import requests
 import random
 import re
-import json
+import io
+import gzip
+import orjson
 import html
 import ast
-from typing import Optional, List, Dict, Tuple
-from bs4 import BeautifulSoup
+from typing import Optional, List, Dict, Tuple, Iterator
+from itertools import islice, count
+from dataclasses import dataclass
+from collections import Counter
+from functools import lru_cache
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve
 from datetime import datetime, timezone
-from xml.etree import ElementTree as ET
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from lxml import etree as ET
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
+from http_cache import ResponseCache
+
 # ================= ENV =================
 
 CURR_URL = os.getenv("CURR_URL", "https://www.furniturecart.com").rstrip("/")
@@ -24,14 +34,38 @@ SITEMAP_INDEX = f"{CURR_URL}/sitemap.xml"
 SITEMAP_OFFSET = int(os.getenv("SITEMAP_OFFSET", "0"))
 MAX_SITEMAPS = int(os.getenv("MAX_SITEMAPS", "0"))
 MAX_URLS_PER_SITEMAP = int(os.getenv("MAX_URLS_PER_SITEMAP", "0"))
-MAX_WORKERS = int(os.getenv("MAX_WORKERS", "4"))
-REQUEST_DELAY_BASE = float(os.getenv("REQUEST_DELAY", "1.0"))
-SAMPLE_SIZE = int(os.getenv("SAMPLE_SIZE", "5"))
 
 # FlareSolverr configuration
 FLARESOLVERR_URL = os.getenv("FLARESOLVERR_URL", "http://localhost:8191/v1")
 FLARESOLVERR_TIMEOUT = int(os.getenv("FLARESOLVERR_TIMEOUT", "60"))
 
+def compute_max_workers() -> int:
+    """
+    MAX_WORKERS from the env when set (> 0); otherwise sized from the CPUs this
+    container may use. Every page goes through FlareSolverr, whose Chrome
+    instances compete with us for those CPUs, so with it configured the pool
+    stays at <= 4 rather than the 4x-CPU fan-out a plain I/O crawl could take.
+    """
+    configured = int(os.getenv("MAX_WORKERS") or "0")
+    if configured > 0:
+        return configured
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    if FLARESOLVERR_URL:  # same test main() uses; FLARESOLVERR_URL="" turns it off
+        return max(1, min(cpus, 4))
+    return min(32, 4 * cpus)
+
+MAX_WORKERS = compute_max_workers()
+VARIATION_WORKERS = int(os.getenv("VARIATION_WORKERS", "4"))  # per-bundle variation fetches
+MAX_QUEUE_SIZE = int(os.getenv("MAX_QUEUE_SIZE", "1000"))  # product URLs queued ahead of the workers
+REQUEST_DELAY_BASE = float(os.getenv("REQUEST_DELAY", "1.0"))
+SAMPLE_SIZE = int(os.getenv("SAMPLE_SIZE", "5"))
+
+# On-disk response cache for robots.txt and sitemaps; set HTTP_CACHE_DIR="" to disable
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+HTTP_CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", "86400"))  # seconds
+# Product pages carry price and stock, so a re-run only reuses them when asked to
+HTTP_CACHE_PRODUCTS = os.getenv("HTTP_CACHE_PRODUCTS", "0") == "1"
+
 # ---------- NEW: chunked single‑sitemap mode ----------
 SITEMAP_URL = os.getenv("SITEMAP_URL", "")          # process exactly this sitemap
 URL_OFFSET   = int(os.getenv("URL_OFFSET", "0"))    # start index inside the sitemap
@@ -43,7 +77,23 @@ if SITEMAP_URL:
 else:
     OUTPUT_CSV = f"products_chunk_{SITEMAP_OFFSET}.csv"
 
+# Chunk CSVs are compressed on the fly by default (artifact upload is byte-billed)
+CSV_GZIP = os.getenv("CSV_GZIP", "1") == "1"
+CSV_GZIP_LEVEL = int(os.getenv("CSV_GZIP_LEVEL", "3"))  # 1 if a small runner goes CPU-bound
+OUTPUT_PATH = OUTPUT_CSV + ".gz" if CSV_GZIP else OUTPUT_CSV
+
 SCRAPED_DATE = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+BUNDLE_RE = re.compile(r'var bundle = new Product\.Bundle\(({.*?})\);', re.DOTALL)
+PRICE_ID_RE = re.compile(r'product-price-\d+')
+PAREN_RE = re.compile(r'\(([^)]+)\)')
+_SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+_LOC_TAGS = (f"{{{_SITEMAP_NS}}}loc", "loc")
+# Product pages end in .html (optionally followed by ?query/#fragment); image locs are dropped
+_KEEP_URL = re.compile(r'\.html(?:$|[?#])').search
+_REJECT_URL = re.compile(r'\.(?:jpe?g|png|gif|webp|bmp|svg)(?:$|[?#])', re.IGNORECASE).search
+SELECTION_ITEMS_SEL = soupsieve.compile("ul > li[class*='selection-item-']")
+# Tags the extractor reads; top-level <script>/<style>/<svg>/<noscript> etc. are never built
+PRODUCT_STRAINER = SoupStrainer(['meta', 'h1', 'input', 'div', 'ul', 'li', 'a', 'link', 'img', 'span'])
 
 # ================= LOGGER =================
 
@@ -52,11 +102,26 @@ def log(msg: str, level: str = "INFO"):
     sys.stderr.write(f"[{timestamp}] [{level}] {msg}\n")
     sys.stderr.flush()
 
+# ================= RESPONSE CACHE =================
+
+response_cache = (
+    ResponseCache(HTTP_CACHE_DIR, HTTP_CACHE_TTL, on_error=lambda msg: log(msg, "WARNING"))
+    if HTTP_CACHE_DIR else None
+)
+
 # ================= FLARESOLVERR SESSION =================
 
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
 class FlareSolverrSession:
     def __init__(self):
         self.session = requests.Session()
+        # Product and variation workers can all be mid-request at once; size the pool so
+        # no connection to FlareSolverr is dropped and re-opened
+        pool_size = MAX_WORKERS + VARIATION_WORKERS
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
@@ -71,6 +136,67 @@ class FlareSolverrSession:
             "Cache-Control": "max-age=0",
             "Referer": CURR_URL + "/",
         }
+        # One persistent FlareSolverr browser session per worker thread: a
+        # shared session would serialise workers on a single browser tab.
+        self._local = threading.local()
+        self._fs_sessions: List[str] = []
+        self._fs_lock = threading.Lock()
+        atexit.register(self.destroy_sessions)
+
+    def _fs_session_id(self) -> Optional[str]:
+        """Create this thread's FlareSolverr session on first use; None falls back to one-shot sessions."""
+        if hasattr(self._local, "fs_session_id"):
+            return self._local.fs_session_id
+        session_id = None
+        try:
+            response = self.session.post(
+                FLARESOLVERR_URL,
+                json={"cmd": "sessions.create"},
+                timeout=FLARESOLVERR_TIMEOUT
+            )
+            result = response.json() if response.status_code == 200 else {}
+            if result.get("status") == "ok":
+                session_id = result.get("session")
+        except Exception as e:
+            log(f"FlareSolverr sessions.create failed: {e}", "WARNING")
+        if session_id:
+            with self._fs_lock:
+                self._fs_sessions.append(session_id)
+        self._local.fs_session_id = session_id
+        return session_id
+
+    def _drop_fs_session(self):
+        """Forget this thread's session after a failure so the next attempt creates a fresh one."""
+        session_id = getattr(self._local, "fs_session_id", None)
+        if hasattr(self._local, "fs_session_id"):
+            del self._local.fs_session_id
+        if not session_id:
+            return
+        with self._fs_lock:
+            if session_id in self._fs_sessions:
+                self._fs_sessions.remove(session_id)
+        try:
+            # Best effort: the session may already be gone with its browser
+            self.session.post(
+                FLARESOLVERR_URL,
+                json={"cmd": "sessions.destroy", "session": session_id},
+                timeout=10
+            )
+        except Exception:
+            pass
+
+    def destroy_sessions(self):
+        with self._fs_lock:
+            sessions, self._fs_sessions = self._fs_sessions, []
+        for session_id in sessions:
+            try:
+                self.session.post(
+                    FLARESOLVERR_URL,
+                    json={"cmd": "sessions.destroy", "session": session_id},
+                    timeout=10
+                )
+            except Exception:
+                pass
 
     def flaresolverr_request(self, url: str, max_retries: int = 3) -> Optional[Tuple[str, int]]:
         """Make request through FlareSolverr to bypass Cloudflare"""
@@ -80,22 +206,27 @@ class FlareSolverrSession:
                     "cmd": "request.get",
                     "url": url,
                     "maxTimeout": 60000,
-                    "session": None,  # Create new session
+                    "session": self._fs_session_id(),
                     "headers": self.headers
                 }
                 
+                # orjson: the reply carries the whole page as a JSON string
                 response = self.session.post(
                     FLARESOLVERR_URL,
-                    json=payload,
+                    data=orjson.dumps(payload),
+                    headers=_JSON_HEADERS,
                     timeout=FLARESOLVERR_TIMEOUT
                 )
                 
                 if response.status_code == 200:
-                    result = response.json()
+                    result = orjson.loads(response.content)
                     
                     if result.get("status") == "ok":
                         solution = result.get("solution", {})
                         content = solution.get("response", "")
+                        # The target site's own status: a challenge page or a 5xx body
+                        # still comes back inside an "ok" envelope
+                        site_status = solution.get("status", 200)
                         
                         # Extract cookies for potential future requests
                         cookies = solution.get("cookies", [])
@@ -112,14 +243,18 @@ class FlareSolverrSession:
                                 if key.lower() not in ["content-length", "content-encoding", "transfer-encoding"]:
                                     self.headers[key] = value
                         
-                        return content, 200
+                        return content, site_status
                 
                 log(f"FlareSolverr attempt {attempt + 1} failed for {url}: {response.status_code}")
+                # An error envelope usually means the session is dead (expired, browser
+                # crashed, FlareSolverr restarted); reusing it would fail every retry
+                self._drop_fs_session()
                 
             except requests.exceptions.Timeout:
                 log(f"FlareSolverr timeout on attempt {attempt + 1} for {url}")
             except requests.exceptions.ConnectionError:
                 log(f"FlareSolverr connection error on attempt {attempt + 1} for {url}")
+                self._drop_fs_session()
             except Exception as e:
                 log(f"FlareSolverr error on attempt {attempt + 1} for {url}: {e}")
             
@@ -128,144 +263,295 @@ class FlareSolverrSession:
         
         return None, 0
 
-    def fetch(self, url: str) -> Optional[Tuple[str, int]]:
-        """Fetch URL through FlareSolverr"""
-        return self.flaresolverr_request(url)
+    def fetch(self, url: str, use_cache: bool = True) -> Optional[Tuple[str, int]]:
+        """Fetch URL through FlareSolverr, serving fresh cached pages without a round trip.
+
+        Only real 200 pages are cached; use_cache=False neither reads nor writes the cache.
+        """
+        if response_cache and use_cache:
+            cached = response_cache.get(url)
+            if cached is not None:
+                return cached, 200
+        content, status = self.flaresolverr_request(url)
+        if response_cache and use_cache and content and status == 200:
+            response_cache.put(url, content)
+        return content, status
 
 flaresolverr_session = FlareSolverrSession()
 
-def get_sitemap_from_robots_txt():
-    try:
-        robots_url = f"{CURR_URL}/robots.txt"
-        content, status = flaresolverr_session.fetch(robots_url)
-        
-        if content and status == 200:
-            sitemap_url = None
-            for line in content.split('\n'):
-                if line.lower().startswith('sitemap:'):
-                    sitemap_url = line.split(':', 1)[1].strip()
-                    break
-            
-            if sitemap_url:
-                print(f"Extracted Sitemap URL: {sitemap_url}")
-                return sitemap_url
-            else:
-                print("No Sitemap directive found in robots.txt")
-                return None
-        else:
-            print(f"Error fetching robots.txt: Status {status}")
-            return None
-            
-    except Exception as e:
-        print(f"Error fetching robots.txt: {e}")
-        return None
+@dataclass(frozen=True)
+class RobotsInfo:
+    crawl_delay: Optional[float]
+    sitemap_url: Optional[str]
 
-def check_robots_txt():
-    """Check robots.txt for crawl delays and sitemap location"""
+
+@lru_cache(maxsize=1)
+def get_robots_info() -> Optional[RobotsInfo]:
+    """Fetch robots.txt through FlareSolverr once per process and parse it once."""
     robots_url = f"{CURR_URL}/robots.txt"
     log(f"Checking robots.txt: {robots_url}")
-    
+
     content, status = flaresolverr_session.fetch(robots_url)
-    if content and status == 200:
-        lines = content.split('\n')
-        crawl_delay = None
-        sitemap_url = None
-        
-        for line in lines:
-            line = line.strip()
-            if line.lower().startswith('sitemap:'):
+    if not (content and status == 200):
+        log("No robots.txt found or couldn't fetch it")
+        return None
+
+    crawl_delay = None
+    sitemap_url = None
+    for line in content.split('\n'):
+        line = line.strip()
+        if line.lower().startswith('sitemap:'):
+            parts = line.split(':', 1)
+            if len(parts) > 1:
+                potential_url = parts[1].strip()
+                if potential_url.startswith('http'):
+                    sitemap_url = potential_url
+                    log(f"Found valid sitemap in robots.txt: {sitemap_url}")
+        elif line.lower().startswith('crawl-delay:'):
+            try:
                 parts = line.split(':', 1)
                 if len(parts) > 1:
-                    potential_url = parts[1].strip()
-                    if potential_url.startswith('http'):
-                        sitemap_url = potential_url
-                        log(f"Found valid sitemap in robots.txt: {sitemap_url}")
-            elif line.lower().startswith('crawl-delay:'):
-                try:
-                    parts = line.split(':', 1)
-                    if len(parts) > 1:
-                        crawl_delay = float(parts[1].strip())
-                        log(f"Found Crawl-delay: {crawl_delay} seconds")
-                except (ValueError, IndexError) as e:
-                    log(f"Error parsing crawl-delay: {e}")
-        
-        return crawl_delay, sitemap_url
-    
-    log("No robots.txt found or couldn't fetch it")
-    return None, None
+                    crawl_delay = float(parts[1].strip())
+                    log(f"Found Crawl-delay: {crawl_delay} seconds")
+            except (ValueError, IndexError) as e:
+                log(f"Error parsing crawl-delay: {e}")
+
+    return RobotsInfo(crawl_delay, sitemap_url)
+
+def get_sitemap_from_robots_txt():
+    info = get_robots_info()
+    if info is None:
+        print("Error fetching robots.txt")
+        return None
+    if info.sitemap_url:
+        print(f"Extracted Sitemap URL: {info.sitemap_url}")
+    else:
+        print("No Sitemap directive found in robots.txt")
+    return info.sitemap_url
+
+def check_robots_txt():
+    """Check robots.txt for crawl delays and sitemap location"""
+    info = get_robots_info()
+    if info is None:
+        return None, None
+    return info.crawl_delay, info.sitemap_url
+
+# Pre-drawn uniform(0, 1) jitter; next() on a count is atomic under the GIL,
+# so workers index it without sharing a Random instance
+_JITTER = [random.random() for _ in range(1 << 12)]
+_jitter_idx = count()
+
+def _jitter() -> float:
+    return _JITTER[next(_jitter_idx) & 0xFFF]
 
 class RequestManager:
     def __init__(self):
         self.request_count = 0
         self.last_request_time = 0
         self.retry_delays = [1, 2, 4]
+        self.lock = threading.Lock()
         
     def _respect_rate_limit(self, crawl_delay=None):
-        current_time = time.time()
-        if self.request_count > 0:
-            elapsed = current_time - self.last_request_time
-            base_delay = crawl_delay if crawl_delay else REQUEST_DELAY_BASE
-            min_delay = base_delay * 0.8
-            max_delay = base_delay * 1.5
-            target_delay = random.uniform(0, 1)
-            
-            if elapsed < target_delay:
-                sleep_time = target_delay - elapsed
-                time.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
-        self.request_count += 1
-        
-        if self.request_count % 20 == 0:
-            long_pause = random.uniform(0, 1)
-            log(f"Taking longer pause after {self.request_count} requests: {long_pause:.1f}s")
+        # Reserve this request's slot under the lock, sleep outside it
+        sleep_time = 0
+        long_pause = 0
+        with self.lock:
+            current_time = time.time()
+            if self.request_count > 0:
+                elapsed = current_time - self.last_request_time
+                target_delay = _jitter()
+                if elapsed < target_delay:
+                    sleep_time = target_delay - elapsed
+
+            self.last_request_time = current_time + sleep_time
+            self.request_count += 1
+            request_count = self.request_count
+
+            if request_count % 20 == 0:
+                long_pause = _jitter()
+
+        if sleep_time:
+            time.sleep(sleep_time)
+        if long_pause:
+            log(f"Taking longer pause after {request_count} requests: {long_pause:.1f}s")
             time.sleep(long_pause)
     
-    def fetch(self, url: str, retry_count: int = 0, crawl_delay=None) -> Optional[str]:
-        if retry_count >= len(self.retry_delays):
-            log(f"Max retries exceeded for {url}")
-            return None
-        
-        self._respect_rate_limit(crawl_delay)
-        content, status = flaresolverr_session.fetch(url)
-        
-        if content and status == 200:
-            return content
-        
-        if status in [403, 429, 503]:
-            delay = self.retry_delays[retry_count] + random.uniform(0, 1)
-            log(f"HTTP {status} for {url} , retry {retry_count+1} in {delay:.1f}s")
-            time.sleep(delay)
-            return self.fetch(url, retry_count + 1, crawl_delay)
-        elif status == 404:
-            log(f"URL not found: {url}")
+    def fetch(self, url: str, retry_count: int = 0, crawl_delay=None, use_cache: bool = True) -> Optional[str]:
+        # Cache hits never touch the site, so they skip the rate limiter too
+        use_cache = use_cache and response_cache is not None
+        if use_cache:
+            cached = response_cache.get(url)
+            if cached is not None:
+                return cached
+        for attempt in range(retry_count, len(self.retry_delays)):
+            self._respect_rate_limit(crawl_delay)
+            content, status = flaresolverr_session.fetch(url, use_cache=False)
+
+            if content and status == 200:
+                if use_cache:
+                    response_cache.put(url, content)
+                return content
+
+            if status in [403, 429, 503]:
+                delay = self.retry_delays[attempt] + _jitter()
+                log(f"HTTP {status} for {url} , retry {attempt+1} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            elif status == 404:
+                log(f"URL not found: {url}")
+                return None
+
+            if status != 200 and status != 0:
+                delay = self.retry_delays[attempt]
+                log(f"Retry {attempt+1} for {url} in {delay}s (status: {status})")
+                time.sleep(delay)
+                continue
+
             return None
-        
-        if status != 200 and status != 0:
-            delay = self.retry_delays[retry_count]
-            log(f"Retry {retry_count+1} for {url} in {delay}s (status: {status})")
-            time.sleep(delay)
-            return self.fetch(url, retry_count + 1, crawl_delay)
-        
+
+        log(f"Max retries exceeded for {url}")
         return None
 
 request_manager = RequestManager()
 
-def http_get(url: str, crawl_delay=None) -> Optional[str]:
-    return request_manager.fetch(url, crawl_delay=crawl_delay)
+def http_get(url: str, crawl_delay=None, use_cache: bool = True) -> Optional[str]:
+    return request_manager.fetch(url, crawl_delay=crawl_delay, use_cache=use_cache)
 
-def load_xml(url: str, crawl_delay=None) -> Optional[ET.Element]:
-    data = http_get(url, crawl_delay)
-    if not data:
+_GZIP_MAGIC = b"\x1f\x8b"
+
+def fetch_gz_sitemap(url: str, crawl_delay=None) -> Optional[bytes]:
+    """
+    Download a .xml.gz sitemap directly and return the XML bytes. FlareSolverr
+    would render the binary through Chrome, so these never go through http_get;
+    generate_chunks counts them the same way, so its chunks line up with ours.
+    """
+    request_manager._respect_rate_limit(crawl_delay)
+    try:
+        with flaresolverr_session.session.get(
+            url, headers=flaresolverr_session.headers, timeout=30, stream=True
+        ) as r:
+            if r.status_code != 200:
+                log(f"Failed to fetch {url}: {r.status_code}", "WARNING")
+                return None
+            data = r.content  # requests already strips a gzip Content-Encoding
+    except requests.RequestException as e:
+        log(f"Failed to fetch {url}: {e}", "WARNING")
         return None
     try:
-        return ET.fromstring(data)
-    except ET.ParseError as e:
-        log(f"XML parse error for {url}: {e}")
+        return gzip.decompress(data) if data[:2] == _GZIP_MAGIC else data
+    except (OSError, EOFError) as e:
+        log(f"Failed to gunzip {url}: {e}", "WARNING")
+        return None
+
+def iter_locs(data, url: str) -> Iterator[str]:
+    """Stream <loc> texts out of sitemap XML, dropping each <url>/<sitemap> entry once read."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")  # lxml rejects str input that carries an encoding declaration
+    ctx = ET.iterparse(io.BytesIO(data), events=("end",), tag=_LOC_TAGS)
+    try:
+        for _, elem in ctx:
+            text = elem.text.strip() if elem.text else ""
+            elem.clear()
+            entry = elem.getparent()  # <url> / <sitemap> wrapper
+            if entry is not None:
+                while entry.getprevious() is not None:
+                    del entry.getparent()[0]
+            if text:
+                yield text
+    except ET.XMLSyntaxError as e:
+        # Re-raised so a truncated or challenge-page sitemap fails loudly instead of
+        # passing for a short one
+        log(f"XML parse error for {url}: {e}", "ERROR")
+        raise
+
+
+def iter_product_urls(data, url: str) -> Iterator[str]:
+    """Product page URLs of a sitemap, in document order."""
+    for u in iter_locs(data, url):
+        if _KEEP_URL(u) and not _REJECT_URL(u):
+            yield u
+
+
+def iter_sitemap_urls(url: str, crawl_delay=None, start: int = 0, limit: int = 0) -> Optional[Iterator[str]]:
+    """Lazy product URLs [start, start+limit) of a sitemap (limit 0 = all remaining); None if it can't be fetched.
+
+    Parsing only advances as URLs are consumed and stops once the slice is
+    filled, so work can start on the first products before the rest is parsed.
+    Malformed XML raises ET.XMLSyntaxError from the consuming loop.
+    """
+    data = fetch_gz_sitemap(url, crawl_delay) if url.endswith(".xml.gz") else http_get(url, crawl_delay)
+    if not data:
         return None
+    return islice(iter_product_urls(data, url), start, start + limit if limit > 0 else None)
 
-csv_lock = threading.Lock()
 
+def load_sitemap_urls(url: str, crawl_delay=None, start: int = 0, limit: int = 0) -> Optional[List[str]]:
+    """Same slice as iter_sitemap_urls, materialised; None if it can't be fetched or parsed."""
+    urls = iter_sitemap_urls(url, crawl_delay, start, limit)
+    if urls is None:
+        return None
+    try:
+        return list(urls)
+    except ET.XMLSyntaxError:
+        return None
+
+CSV_BATCH_ROWS = int(os.getenv("CSV_BATCH_ROWS", "1000"))  # rows per write()+flush
+CSV_BUFFER_SIZE = 1024 * 1024
+_CSV_SPECIAL = re.compile(r'[,"\r\n]')
+
+
+def encode_csv_row(row) -> bytes:
+    """One CSV record as UTF-8 bytes, quoted exactly like csv.writer's QUOTE_MINIMAL."""
+    cells = []
+    for c in row:
+        c = '' if c is None else str(c)
+        if _CSV_SPECIAL.search(c):
+            c = '"' + c.replace('"', '""') + '"'
+        cells.append(c)
+    return (','.join(cells) + '\r\n').encode('utf-8')
+
+
+def open_output_csv():
+    """Binary handle for OUTPUT_PATH, gzip-compressed when CSV_GZIP is on."""
+    if CSV_GZIP:
+        raw = gzip.open(OUTPUT_PATH, "wb", compresslevel=CSV_GZIP_LEVEL)
+        return io.BufferedWriter(raw, buffer_size=CSV_BUFFER_SIZE)
+    return open(OUTPUT_PATH, "wb", buffering=CSV_BUFFER_SIZE)
+
+
+class CsvWriterThread(threading.Thread):
+    """Single consumer that owns the output file; workers only enqueue rows."""
+
+    def __init__(self, f):
+        super().__init__(daemon=True)
+        self.f = f
+        self.q: "queue.SimpleQueue[Optional[list]]" = queue.SimpleQueue()
+
+    def writerow(self, row):
+        self.q.put(row)
+
+    def _write(self, batch: List[bytes]):
+        self.f.write(b''.join(batch))
+        self.f.flush()
+        batch.clear()
+
+    def run(self):
+        batch: List[bytes] = []
+        while True:
+            row = self.q.get()
+            if row is None:
+                break
+            batch.append(encode_csv_row(row))
+            if len(batch) >= CSV_BATCH_ROWS:
+                self._write(batch)
+        if batch:
+            self._write(batch)
+
+    def close(self):
+        self.q.put(None)
+        self.join()
+
+@lru_cache(maxsize=4096)  # bundle variations repeat the same main image
 def normalize_image_url(url: str) -> str:
     if not url:
         return ""
@@ -279,43 +565,100 @@ def normalize_image_url(url: str) -> str:
     
     return url
 
+# Shared across products so variation threads, and their FlareSolverr sessions, are reused
+variation_pool = ThreadPoolExecutor(max_workers=VARIATION_WORKERS, thread_name_prefix="variation")
+
+def _set_name(li) -> str:
+    """Bundle selection name; only falls back to the (full-subtree) text when the attribute is absent."""
+    name = li.get('data-item-set-name')
+    return li.get_text(strip=True) if name is None else name
+
+def _detail(attr_map: dict, key: str):
+    """First description div whose row title contains key (titles may carry a trailing colon)."""
+    for title, desc_div in attr_map.items():
+        if key in title:
+            return desc_div
+    return None
+
+
+_INDEXED_TAGS = ['meta', 'input', 'h1', 'img', 'link', 'div', 'li', 'a', 'span']
+
+
+def _index_page(soup: BeautifulSoup) -> dict:
+    """
+    Walk the tree once and keep the first element for every lookup the extractor
+    makes, keyed (tag, attr, value); replaces ~20 separate soup.find() walks.
+    """
+    idx = {}
+    for el in soup.find_all(_INDEXED_TAGS):
+        tag = el.name
+        attrs = el.attrs
+        for attr in ('itemprop', 'id', 'name'):
+            value = attrs.get(attr)
+            if value:
+                idx.setdefault((tag, attr, value), el)
+        classes = attrs.get('class')
+        if classes:
+            for cls in classes:
+                idx.setdefault((tag, 'class', cls), el)
+            if tag == 'li':
+                idx.setdefault((tag, 'class-str', ' '.join(classes)), el)
+            elif tag == 'span' and 'price' in classes and PRICE_ID_RE.search(attrs.get('id', '')):
+                idx.setdefault((tag, 'price-id', None), el)
+        if tag == 'a':
+            href = attrs.get('href')
+            if href:
+                if '/brand/' in href:
+                    idx.setdefault((tag, 'href', '/brand/'), el)
+                if '/collection/' in href:
+                    idx.setdefault((tag, 'href', '/collection/'), el)
+    return idx
+
+
 def extract_product_info_from_html(html: str, product_url: str) -> dict:
     """
     Parse product HTML and return a dictionary with all required fields.
     """
-    soup = BeautifulSoup(html, 'html.parser')
+    return extract_product_info_from_soup(BeautifulSoup(html, 'lxml', parse_only=PRODUCT_STRAINER), product_url)
+
+
+def extract_product_info_from_soup(soup: BeautifulSoup, product_url: str) -> dict:
+    """
+    Same as extract_product_info_from_html, for a page that is already parsed.
+    """
     info = {}
+    idx = _index_page(soup)
 
     # --- product_id ---
-    prod_input = soup.find('input', {'name': 'product'})
+    prod_input = idx.get(('input', 'name', 'product'))
     info['product_id'] = prod_input.get('value', '') if prod_input else ''
 
     # --- sku & variation_id ---
-    sku_meta = soup.find('meta', {'itemprop': 'sku'})
+    sku_meta = idx.get(('meta', 'itemprop', 'sku'))
     info['sku'] = sku_meta.get('content', '') if sku_meta else ''
     # Use the SKU as the variation ID for this bundle configuration
     info['variation_id'] = info['sku']
 
     # --- mpn ---
-    mpn_meta = soup.find('meta', {'itemprop': 'mpn'})
+    mpn_meta = idx.get(('meta', 'itemprop', 'mpn'))
     info['mpn'] = mpn_meta.get('content', '') if mpn_meta else ''
 
     # --- name ---
-    name_h1 = soup.find('h1', {'itemprop': 'name'})
+    name_h1 = idx.get(('h1', 'itemprop', 'name'))
     info['name'] = name_h1.get_text(strip=True) if name_h1 else ''
 
     # --- brand ---
-    brand_meta = soup.find('meta', {'itemprop': 'brand'})
+    brand_meta = idx.get(('meta', 'itemprop', 'brand'))
     if brand_meta:
         info['brand'] = brand_meta.get('content', '')
     else:
-        brand_link = soup.find('a', href=lambda h: h and '/brand/' in h)
+        brand_link = idx.get(('a', 'href', '/brand/'))
         info['brand'] = brand_link.get_text(strip=True) if brand_link else ''
 
     # --- category & category_url (from breadcrumbs) ---
     info['category'] = ''
     info['category_url'] = ''
-    breadcrumbs = soup.find('div', class_='breadcrumbs')
+    breadcrumbs = idx.get(('div', 'class', 'breadcrumbs'))
     if breadcrumbs:
         crumbs = breadcrumbs.find_all('li')
         # Home (0), Bedroom (1), Bedroom Furniture (2), Bedroom Sets (3)
@@ -327,11 +670,11 @@ def extract_product_info_from_html(html: str, product_url: str) -> dict:
                 info['category_url'] = cat_link.get('href', '')
 
     # --- price ---
-    price_meta = soup.find('meta', {'itemprop': 'price'})
+    price_meta = idx.get(('meta', 'itemprop', 'price'))
     if price_meta:
         info['price'] = price_meta.get('content', '').strip()
     else:
-        price_span = soup.find('span', {'class': 'price', 'id': re.compile(r'product-price-\d+')})
+        price_span = idx.get(('span', 'price-id', None))
         if price_span:
             raw = price_span.get_text(strip=True).replace('$', '').replace(',', '')
             info['price'] = raw.strip()
@@ -339,56 +682,50 @@ def extract_product_info_from_html(html: str, product_url: str) -> dict:
             info['price'] = ''
 
     # --- main_image (full size) ---
-    img_meta = soup.find('meta', {'itemprop': 'image'})
+    img_meta = idx.get(('meta', 'itemprop', 'image'))
     if img_meta:
         info['main_image'] = img_meta.get('content', '')
     else:
-        img_main = soup.find('img', {'id': 'image-main'})
+        img_main = idx.get(('img', 'id', 'image-main'))
         info['main_image'] = img_main.get('src', '') if img_main else ''
 
     # --- quantity (global) ---
-    qty_input = soup.find('input', {'id': 'qty-input'})
+    qty_input = idx.get(('input', 'id', 'qty-input'))
     info['quantity'] = qty_input.get('value', '1') if qty_input else '1'
 
     # --- group_attr_1: selected bed size ---
     bed_size = ''
     # Look for the active Queen bed option (adjust class if King is selected)
-    active_bed = soup.find('li', class_='option-item-209551 selection-item-263524 active')
+    active_bed = idx.get(('li', 'class-str', 'option-item-209551 selection-item-263524 active'))
     if active_bed:
         text = active_bed.get_text()
-        match = re.search(r'\(([^)]+)\)', text)
+        match = PAREN_RE.search(text)
         if match:
             bed_size = match.group(1)
     info['group_attr_1'] = bed_size
 
+    # --- "Additional Information" rows, indexed once by title ---
+    add_info = idx.get(('div', 'class', 'product-details'))
+    rows = add_info.find_all('li', class_='clearer') if add_info else []
+    if not rows:
+        first_li = idx.get(('li', 'class', 'clearer'))
+        if first_li:
+            rows = [first_li, *first_li.find_next_siblings('li', class_='clearer')]
+    attr_map = {}
+    for li in rows:
+        title_div = li.find('div', class_='title')
+        desc_div = li.find('div', class_='description')
+        if title_div and desc_div:
+            attr_map.setdefault(title_div.get_text(strip=True), desc_div)
+
     # --- group_attr_2: color ---
-    color = ''
-    # Try from the "Additional Information" panel first
-    add_info = soup.find('div', class_='product-details')
-    if add_info:
-        for li in add_info.find_all('li', class_='clearer'):
-            title_div = li.find('div', class_='title')
-            if title_div and 'Color' in title_div.get_text():
-                desc_div = li.find('div', class_='description')
-                if desc_div:
-                    color = desc_div.get_text(strip=True)
-                    break
-    if not color:
-        # Fallback: look in the dimension/attribute list
-        color_li = soup.find('li', class_='clearer')
-        while color_li:
-            title = color_li.find('div', class_='title')
-            if title and 'Color' in title.get_text():
-                desc = color_li.find('div', class_='description')
-                if desc:
-                    color = desc.get_text(strip=True)
-                    break
-            color_li = color_li.find_next_sibling('li', class_='clearer')
+    color_div = _detail(attr_map, 'Color')
+    color = color_div.get_text(strip=True) if color_div else ''
     info['group_attr_2'] = color
 
     # --- status (availability) ---
     status = ''
-    avail_link = soup.find('link', {'itemprop': 'availability'})
+    avail_link = idx.get(('link', 'itemprop', 'availability'))
     if avail_link:
         href = avail_link.get('href', '')
         if 'InStock' in href:
@@ -396,16 +733,8 @@ def extract_product_info_from_html(html: str, product_url: str) -> dict:
         elif 'OutOfStock' in href:
             status = 'Out of Stock'
     if not status:
-        # Fallback from product details
-        status_li = soup.find('li', class_='clearer')
-        while status_li:
-            title = status_li.find('div', class_='title')
-            if title and 'Availability' in title.get_text():
-                desc = status_li.find('div', class_='description')
-                if desc:
-                    status = desc.get_text(strip=True)
-                    break
-            status_li = status_li.find_next_sibling('li', class_='clearer')
+        status_div = _detail(attr_map, 'Availability')
+        status = status_div.get_text(strip=True) if status_div else ''
     info['status'] = status
 
     # --- additional_data: JSON with extra info (collection, dimensions, features) ---
@@ -413,24 +742,17 @@ def extract_product_info_from_html(html: str, product_url: str) -> dict:
 
     # Collection
     collection = ''
-    coll_link = soup.find('a', href=lambda h: h and '/collection/' in h)
+    coll_link = idx.get(('a', 'href', '/collection/'))
     if coll_link:
         collection = coll_link.get_text(strip=True)
     else:
-        coll_li = soup.find('li', class_='clearer')
-        while coll_li:
-            title = coll_li.find('div', class_='title')
-            if title and 'Collection' in title.get_text():
-                desc = coll_li.find('div', class_='description')
-                if desc:
-                    collection = desc.get_text(strip=True)
-                    break
-            coll_li = coll_li.find_next_sibling('li', class_='clearer')
+        coll_div = _detail(attr_map, 'Collection')
+        collection = coll_div.get_text(strip=True) if coll_div else ''
     additional['collection'] = collection
 
     # Dimensions (extract from the dimensions tab)
     dims = {}
-    dims_section = soup.find('div', class_='product-dimensions')
+    dims_section = idx.get(('div', 'class', 'product-dimensions'))
     if dims_section:
         for row in dims_section.find_all('li', class_='clearer'):
             title_div = row.find('div', class_='title')
@@ -442,51 +764,59 @@ def extract_product_info_from_html(html: str, product_url: str) -> dict:
 
     # Features (from the Details tab)
     features = []
-    details_section = soup.find('div', class_='product-details')
-    if details_section:
-        for li in details_section.find_all('li', class_='clearer'):
-            title_div = li.find('div', class_='title')
-            if title_div and 'Features' in title_div.get_text():
-                desc_div = li.find('div', class_='description')
-                if desc_div:
-                    raw = desc_div.get_text(separator='\n').strip()
-                    features = [f.strip() for f in raw.split('\n') if f.strip()]
-                    break
+    features_div = _detail(attr_map, 'Features')
+    if features_div:
+        raw = features_div.get_text(separator='\n').strip()
+        features = [f.strip() for f in raw.split('\n') if f.strip()]
     additional['features'] = features
 
-    info['additional_data'] = json.dumps(additional, ensure_ascii=False)
+    info['additional_data'] = orjson.dumps(additional).decode()
 
     return info
 
 
 def getBundleData(html):
-  
-    soup = BeautifulSoup(html, 'html.parser')
-    
-    # Find script tags containing Product.Bundle initialization
-    script_pattern = re.compile(r'var bundle = new Product\.Bundle\(({.*?})\);', re.DOTALL)
-    
-    # Look in all script tags
-    for script in soup.find_all('script'):
-        if script.string:
-            # Search for Product.Bundle pattern
-            match = script_pattern.search(script.string)
-            if match:
-                # Return the raw JSON string from the JavaScript object
-                return match.group(1).strip()
-    
-    return None
+    """Return the raw Product.Bundle({...}) JSON from the page source, or None."""
+    match = BUNDLE_RE.search(html)
+    return match.group(1).strip() if match else None
+
+class WorkerStats:
+    """
+    Run counters kept per worker thread and summed on read, so concurrent
+    increments never race on (or bounce) one shared dict entry.
+    """
+
+    def __init__(self, **initial):
+        self._base = Counter(initial)
+        self._local = threading.local()
+        self._counters: List[Counter] = []
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, n: int = 1):
+        counter = getattr(self._local, "counter", None)
+        if counter is None:
+            counter = self._local.counter = Counter()
+            with self._lock:
+                self._counters.append(counter)
+        counter[key] += n
+
+    def __getitem__(self, key: str) -> int:
+        with self._lock:
+            counters = list(self._counters)
+        return self._base[key] + sum(c[key] for c in counters)
 
-def process_product_data(product_url: str, writer, seen: set, stats: dict, crawl_delay=None):
-    if product_url in seen:
-        return
-    seen.add(product_url)
 
+def process_product_data(product_url: str, writer, stats: "WorkerStats", crawl_delay=None):
     log(f"Processing product URL: {product_url}", "DEBUG")
 
     # Fetch the original product page
-    html = http_get(product_url, crawl_delay)
-    soup = BeautifulSoup(html, 'html.parser')
+    html = http_get(product_url, crawl_delay, use_cache=HTTP_CACHE_PRODUCTS)
+    if not html:
+        log(f"Failed to fetch product page: {product_url}", "ERROR")
+        stats.incr('errors')
+        return
+    # Parse once; field extraction and the bundle-set lookup share this tree
+    soup = BeautifulSoup(html, 'lxml', parse_only=PRODUCT_STRAINER)
 
     # --- Extract bundle data from JavaScript ---
     bundleId = None
@@ -495,7 +825,7 @@ def process_product_data(product_url: str, writer, seen: set, stats: dict, crawl
     bundleJson = getBundleData(html)
     if bundleJson:
         try:
-            bundleData = json.loads(bundleJson)
+            bundleData = orjson.loads(bundleJson)
             bundleId = bundleData.get('bundleId')
             if bundleId:
                 options = bundleData.get('options', {})
@@ -518,7 +848,7 @@ def process_product_data(product_url: str, writer, seen: set, stats: dict, crawl
         if not bundle_set:
             log("No <div class='bundle-set'> found – cannot process variations. Writing original row as fallback.", "WARNING")
         else:
-            selection_items = bundle_set.select("ul > li[class*='selection-item-']")
+            selection_items = SELECTION_ITEMS_SEL.select(bundle_set)
             if not selection_items:
                 log("No selection items found in bundle-set – cannot process variations. Writing original row as fallback.", "WARNING")
             else:
@@ -532,7 +862,7 @@ def process_product_data(product_url: str, writer, seen: set, stats: dict, crawl
                         if cls.startswith('selection-item-'):
                             sel_id = cls.replace('selection-item-', '')
                             break
-                    name = li.get('data-item-set-name', li.get_text(strip=True))
+                    name = _set_name(li)
                     if sel_id:
                         selection_id_to_name[sel_id] = name
                     expected_names.add(name)
@@ -543,28 +873,28 @@ def process_product_data(product_url: str, writer, seen: set, stats: dict, crawl
 
                 processed_names = set()
 
-                for i in range(1, max_selections_length + 1):
-                    items_value = bundleId - i
+                # Sitemap product URLs carry no query string or fragment, so the common case
+                # is a plain concatenation; only re-encode when other params must survive or
+                # a fragment would swallow the appended query
+                prefix = product_url + '?'
+                if '?' in product_url or '#' in product_url:
                     parsed = urlparse(product_url)
-                    query_dict = parse_qs(parsed.query, keep_blank_values=True)
-
-                    # Remove any existing items parameters
-                    keys_to_remove = [k for k in query_dict if k.startswith('items')]
-                    for k in keys_to_remove:
-                        del query_dict[k]
-
-                    param_key = f'items'
-                    query_dict[param_key] = [str(items_value)]
-                    new_query = urlencode(query_dict, doseq=True)
-                    new_parsed = parsed._replace(query=new_query)
-                    variation_url = urlunparse(new_parsed)
-
-                    log(f"Fetching variation: {variation_url}", "DEBUG")
-                    variation_html = http_get(variation_url, crawl_delay)
+                    kept = {k: v for k, v in parse_qs(parsed.query, keep_blank_values=True).items()
+                            if not k.startswith('items')}
+                    query = urlencode(kept, doseq=True)
+                    prefix = urlunparse(parsed._replace(query='', fragment='')) + '?' + (query + '&' if query else '')
+                variation_urls = [f"{prefix}items={bundleId - i}" for i in range(1, max_selections_length + 1)]
+
+                # Variation pages are independent FlareSolverr round trips: fetch them together,
+                # then walk the results in order so the first page per name still wins
+                log(f"Fetching {len(variation_urls)} variations for {product_url}", "DEBUG")
+                variation_pages = list(variation_pool.map(lambda u: http_get(u, crawl_delay, use_cache=HTTP_CACHE_PRODUCTS), variation_urls))
+
+                for variation_url, variation_html in zip(variation_urls, variation_pages):
                     if not variation_html:
                         continue
 
-                    variation_soup = BeautifulSoup(variation_html, 'html.parser')
+                    variation_soup = BeautifulSoup(variation_html, 'lxml', parse_only=PRODUCT_STRAINER)
                     var_bundle_set = variation_soup.find('div', class_='bundle-set')
                     if not var_bundle_set:
                         continue
@@ -573,7 +903,7 @@ def process_product_data(product_url: str, writer, seen: set, stats: dict, crawl
                     if not var_active_li:
                         continue
 
-                    active_name = var_active_li.get('data-item-set-name', var_active_li.get_text(strip=True))
+                    active_name = _set_name(var_active_li)
 
                     if active_name not in expected_names:
                         log(f"Active name '{active_name}' not in expected set, skipping.", "DEBUG")
@@ -584,10 +914,10 @@ def process_product_data(product_url: str, writer, seen: set, stats: dict, crawl
 
                     # --- Valid variation – extract product data ---
                     try:
-                        var_product_info = extract_product_info_from_html(variation_html, variation_url)
+                        var_product_info = extract_product_info_from_soup(variation_soup, variation_url)
                     except Exception as e:
                         log(f"Failed to extract product info from variation: {e}", "ERROR")
-                        stats['errors'] += 1
+                        stats.incr('errors')
                         continue
 
                     # Write CSV row
@@ -613,15 +943,14 @@ def process_product_data(product_url: str, writer, seen: set, stats: dict, crawl
                             var_product_info.get('additional_data', ''),
                             SCRAPED_DATE
                         ]
-                        with csv_lock:
-                            writer.writerow(row)
-                        stats['products_fetched'] += 1
+                        writer.writerow(row)
+                        stats.incr('products_fetched')
                         variation_rows_written += 1
                         processed_names.add(active_name)
                         log(f"Fetched bundle variation: {active_name}", "INFO")
                     except Exception as e:
                         log(f"Error writing row for variation: {e}", "ERROR")
-                        stats['errors'] += 1
+                        stats.incr('errors')
 
                 # After loop: warn about missing variations
                 missing = expected_names - processed_names
@@ -631,7 +960,7 @@ def process_product_data(product_url: str, writer, seen: set, stats: dict, crawl
     # --- If we are not a bundle, OR we are a bundle but failed to write any variation row, write the original product row ---
     if not is_bundle or variation_rows_written == 0:
         try:
-            product_info = extract_product_info_from_html(html, product_url)
+            product_info = extract_product_info_from_soup(soup, product_url)
             row = [
                 product_url,
                 product_info.get('product_id', ''),
@@ -653,17 +982,47 @@ def process_product_data(product_url: str, writer, seen: set, stats: dict, crawl
                 product_info.get('additional_data', ''),
                 SCRAPED_DATE
             ]
-            with csv_lock:
-                writer.writerow(row)
-            stats['products_fetched'] += 1
+            writer.writerow(row)
+            stats.incr('products_fetched')
             log(f"Fetched original product {product_info.get('sku', '')}: {product_info.get('name', '')[:50]}...", "INFO")
         except Exception as e:
             log(f"Failed to extract/write original product info: {e}", "ERROR")
-            stats['errors'] += 1
-    stats['urls_processed'] += 1
+            stats.incr('errors')
+    stats.incr('urls_processed')
 
 # ================= MAIN =================
 
+def submit_products(executor, urls, writer, seen: set, pending: threading.Semaphore,
+                    stats: "WorkerStats", crawl_delay=None) -> int:
+    """
+    Queue product URLs on the pool, at most MAX_QUEUE_SIZE ahead of the workers,
+    so a large sitemap doesn't hold one pending future per URL. pending is created
+    once per run (Semaphore(MAX_QUEUE_SIZE)) so the bound holds across sitemaps.
+    Callers wait for completion by shutting the pool down.
+
+    Dedup happens here, on the submitting thread; seen holds hash(url) ints
+    rather than the URL strings to keep it small across a whole run.
+    Returns the number of URLs queued.
+    """
+    def on_done(future):
+        pending.release()
+        exc = future.exception()
+        if exc is not None:
+            log(f"Error in thread execution: {exc}", "ERROR")
+            stats.incr('errors')
+
+    queued = 0
+    for url in urls:
+        key = hash(url)
+        if key in seen:
+            continue
+        seen.add(key)
+        pending.acquire()
+        executor.submit(process_product_data, url, writer, stats, crawl_delay).add_done_callback(on_done)
+        queued += 1
+    return queued
+
+
 def main():
     crawl_delay, robots_sitemap = check_robots_txt()
     crawl_delay = 0  # Override for this site (adjust if needed)
@@ -678,50 +1037,25 @@ def main():
         log(f"URL_OFFSET: {URL_OFFSET}")
         log(f"MAX_URLS_PER_SITEMAP (limit): {MAX_URLS_PER_SITEMAP}")
         log(f"CHUNK_ID: {CHUNK_ID}")
-        log(f"OUTPUT_CSV: {OUTPUT_CSV}")
+        log(f"MAX_WORKERS: {MAX_WORKERS}")
+        log(f"OUTPUT_CSV: {OUTPUT_PATH}")
         log("=" * 60)
 
-        # Load the sitemap
-        xml = load_xml(SITEMAP_URL, crawl_delay)
-        if not xml:
+        # Stream the sitemap, keeping only this chunk's slice (limit = 0 means "all remaining")
+        start = URL_OFFSET
+        urls_to_process = load_sitemap_urls(SITEMAP_URL, crawl_delay, start, MAX_URLS_PER_SITEMAP)
+        if urls_to_process is None:
             log(f"Failed to load sitemap: {SITEMAP_URL}", "ERROR")
             sys.exit(1)
 
-        # Extract all product URLs (same filtering as before)
-        ns = {"ns": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-        urls = []
-        for path in [".//ns:url/ns:loc", ".//url/loc", ".//loc"]:
-            elements = xml.findall(path, ns) if "ns:" in path else xml.findall(path)
-            if elements:
-                urls = [
-                    e.text.strip()
-                    for e in elements
-                    if e.text
-                    and not any(ext in e.text for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.svg'])
-                    and ('.html' in e.text)
-                ]
-                if urls:
-                    break
-
-        if not urls:
-            log(f"No product URLs found in sitemap: {SITEMAP_URL}", "WARNING")
-            sys.exit(0)
-
-        total_urls = len(urls)
-        start = URL_OFFSET
-        # limit = 0 means "all remaining"
-        end = start + MAX_URLS_PER_SITEMAP if MAX_URLS_PER_SITEMAP > 0 else total_urls
-        urls_to_process = urls[start:end]
-
-        log(f"Sitemap contains {total_urls} product URLs. Processing {len(urls_to_process)} URLs (offset {start})")
+        log(f"Processing {len(urls_to_process)} product URLs from sitemap (offset {start})")
         if not urls_to_process:
             log("No URLs to process in this chunk – exiting.")
             sys.exit(0)
 
         # Initialize CSV and write header
-        with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow([
+        with open_output_csv() as f:
+            f.write(encode_csv_row([
                 "Ref Product URL",
                 "Ref Product ID",
                 "Ref Varient ID",
@@ -741,30 +1075,19 @@ def main():
                 "Ref Status",
                 "Additional Product Data",
                 "Date Scrapped"
-            ])
+            ]))
 
             seen = set()
-            stats = {
-                'sitemaps_processed': 1,
-                'urls_processed': 0,
-                'products_fetched': 0,
-                'errors': 0
-            }
-
-            # Process URLs with ThreadPoolExecutor
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                futures = [
-                    executor.submit(process_product_data, url, writer, seen, stats, crawl_delay)
-                    for url in urls_to_process
-                ]
-                for future in as_completed(futures):
-                    try:
-                        future.result()
-                    except Exception as e:
-                        log(f"Error in thread execution: {e}", "ERROR")
-                        stats['errors'] += 1
+            pending = threading.Semaphore(MAX_QUEUE_SIZE)
+            stats = WorkerStats(sitemaps_processed=1)
 
-            gc.collect()
+            writer = CsvWriterThread(f)
+            writer.start()
+            try:
+                with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                    submit_products(executor, urls_to_process, writer, seen, pending, stats, crawl_delay)
+            finally:
+                writer.close()
 
         # Statistics for this chunk
         log("=" * 60)
@@ -779,7 +1102,7 @@ def main():
             success_rate = (stats['products_fetched'] / stats['urls_processed']) * 100
             log(f"Success rate:       {success_rate:.1f}%")
         log("=" * 60)
-        log(f"Chunk output saved: {OUTPUT_CSV}")
+        log(f"Chunk output saved: {OUTPUT_PATH}")
         log("=" * 60)
         return
 
@@ -811,18 +1134,16 @@ def main():
             log(f"No valid sitemap in robots.txt, using default: {sitemap}")
 
     log(f"Loading sitemap index from {sitemap}")
-    index = load_xml(sitemap, crawl_delay)
-    if index is None:
+    index = http_get(sitemap, crawl_delay)
+    if not index:
         log("Failed to load sitemap index", "ERROR")
         sys.exit(1)
 
-    ns = {"ns": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-    sitemaps = []
-    for path in [".//ns:sitemap/ns:loc", ".//sitemap/loc", ".//loc"]:
-        elements = index.findall(path, ns) if "ns:" in path else index.findall(path)
-        if elements:
-            sitemaps = [e.text.strip() for e in elements if e.text]
-            break
+    try:
+        sitemaps = list(iter_locs(index, sitemap))
+    except ET.XMLSyntaxError:
+        log("Failed to parse sitemap index", "ERROR")
+        sys.exit(1)
 
     if not sitemaps:
         log("No sitemaps found with XML parsing, trying regex", "WARNING")
@@ -838,9 +1159,8 @@ def main():
     log(f"Total sitemaps found: {len(sitemaps)}")
     log(f"Sitemaps to process: {len(sitemaps_to_process)}")
 
-    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([
+    with open_output_csv() as f:
+        f.write(encode_csv_row([
             "Ref Product URL",
             "Ref Product ID",
             "Ref Varient ID",
@@ -860,63 +1180,41 @@ def main():
             "Ref Status",
             "Additional Product Data",
             "Date Scrapped"
-        ])
+        ]))
 
         seen = set()
-        stats = {
-            'sitemaps_processed': 0,
-            'urls_processed': 0,
-            'products_fetched': 0,
-            'errors': 0
-        }
+        pending = threading.Semaphore(MAX_QUEUE_SIZE)  # shared by every sitemap's submissions
+        stats = WorkerStats(sitemaps_processed=0)
 
-        for sitemap_url in sitemaps_to_process:
-            stats['sitemaps_processed'] += 1
-            log(f"Processing sitemap {stats['sitemaps_processed']}/{len(sitemaps_to_process)}: {sitemap_url}")
-
-            xml = load_xml(sitemap_url, crawl_delay)
-            if not xml:
-                log(f"Failed to load sitemap: {sitemap_url}", "ERROR")
-                continue
-
-            urls = []
-            for path in [".//ns:url/ns:loc", ".//url/loc", ".//loc"]:
-                elements = xml.findall(path, ns) if "ns:" in path else xml.findall(path)
-                if elements:
-                    urls = [
-                        e.text.strip()
-                        for e in elements
-                        if e.text
-                        and not any(ext in e.text for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.svg'])
-                        and ('.html' in e.text)
-                    ]
-                    if urls:
-                        break
-
-            if not urls:
-                log(f"No product URLs found in sitemap: {sitemap_url}", "WARNING")
-                continue
+        writer = CsvWriterThread(f)
+        writer.start()
+        # One pool for every sitemap: its threads (and their FlareSolverr sessions) live for the run
+        executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        try:
+            for sitemap_url in sitemaps_to_process:
+                stats.incr('sitemaps_processed')
+                log(f"Processing sitemap {stats['sitemaps_processed']}/{len(sitemaps_to_process)}: {sitemap_url}")
 
-            if MAX_URLS_PER_SITEMAP > 0:
-                original_count = len(urls)
-                urls = urls[:MAX_URLS_PER_SITEMAP]
-                log(f"Limited to {len(urls)} out of {original_count} URLs")
-            else:
-                log(f"Found {len(urls)} product URLs in this sitemap")
-
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                futures = [
-                    executor.submit(process_product_data, url, writer, seen, stats, crawl_delay)
-                    for url in urls
-                ]
-                for future in as_completed(futures):
-                    try:
-                        future.result()
-                    except Exception as e:
-                        log(f"Error in thread execution: {e}", "ERROR")
-                        stats['errors'] += 1
+                urls = iter_sitemap_urls(sitemap_url, crawl_delay, 0, MAX_URLS_PER_SITEMAP)
+                if urls is None:
+                    log(f"Failed to load sitemap: {sitemap_url}", "ERROR")
+                    continue
 
-            gc.collect()
+                # Streams straight from the parser into the bounded pool queue
+                try:
+                    queued = submit_products(executor, urls, writer, seen, pending, stats, crawl_delay)
+                except ET.XMLSyntaxError:
+                    log(f"Failed to parse sitemap: {sitemap_url}", "ERROR")
+                    continue
+                if not queued:
+                    log(f"No product URLs found in sitemap: {sitemap_url}", "WARNING")
+                elif MAX_URLS_PER_SITEMAP > 0:
+                    log(f"Queued {queued} URLs (MAX_URLS_PER_SITEMAP={MAX_URLS_PER_SITEMAP})")
+                else:
+                    log(f"Queued {queued} product URLs from this sitemap")
+        finally:
+            executor.shutdown()
+            writer.close()
 
     # Statistics
     log("=" * 60)
@@ -930,13 +1228,17 @@ def main():
         success_rate = (stats['products_fetched'] / stats['urls_processed']) * 100
         log(f"Success rate: {success_rate:.1f}%")
     log("=" * 60)
-    log(f"Completed: {OUTPUT_CSV}")
+    log(f"Completed: {OUTPUT_PATH}")
     log("=" * 60)
 
 if __name__ == "__main__":
     import urllib3
     urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+    # Parsed pages are cyclic soup trees: let gen-0 batch far more allocations
+    # before collecting instead of forcing full sweeps between sitemaps
+    gc.set_threshold(50_000, 100, 100)
+
     if not CURR_URL:
         log("Error: CURR_URL environment variable is required", "ERROR")
         sys.exit(1)
@@ -7,15 +7,24 @@ of at most URLS_PER_JOB URLs.
 
 import os
 import sys
-import json
+import gzip
+import orjson
 import time
+import random
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
+import io
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Optional, List, Dict, Tuple
-from xml.etree import ElementTree as ET
+from typing import Optional, List, Dict, Tuple, Iterator
+from itertools import islice
+from lxml import etree
 from datetime import datetime, timezone
 
+from http_cache import ResponseCache
+
 # ---------- ENV ----------
 CURR_URL = os.environ.get("CURR_URL", "").rstrip("/")
 if not CURR_URL:
@@ -28,15 +37,51 @@ MAX_URLS_PER_SITEMAP = int(os.environ.get("MAX_URLS_PER_SITEMAP", "0"))
 URLS_PER_JOB = int(os.environ.get("URLS_PER_JOB", "500"))
 SITEMAP_OFFSET = int(os.environ.get("SITEMAP_OFFSET", "0"))
 FLARESOLVERR_URL = os.environ.get("FLARESOLVERR_URL")
-CHUNK_GEN_WORKERS = int(os.environ.get("CHUNK_GEN_WORKERS", "2"))
+_cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+CHUNK_GEN_WORKERS = int(os.environ.get("CHUNK_GEN_WORKERS", "16"))
+if CHUNK_GEN_WORKERS <= 0:
+    # Unset/0 -> size the pool from the CPUs this container may actually use
+    CHUNK_GEN_WORKERS = _cpus * 4
+# Each FlareSolverr request.get starts a Chrome inside the one FlareSolverr container;
+# same <= min(cpus, 4) cap fp_fc_scraper uses, while direct .xml.gz downloads and
+# HEADs keep the full CHUNK_GEN_WORKERS fan-out
+FLARESOLVERR_CONCURRENCY = int(os.environ.get("FLARESOLVERR_CONCURRENCY", "0")) or max(1, min(_cpus, 4))
+_fs_slots = threading.BoundedSemaphore(FLARESOLVERR_CONCURRENCY)
 
-HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; SitemapParser/1.0)"}
+_SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+_LOC_TAGS = (f"{{{_SITEMAP_NS}}}loc", "loc")
+# Same product-URL test as fp_fc_scraper
+_KEEP_URL = re.compile(r"\.html(?:$|[?#])").search
+_REJECT_URL = re.compile(r"\.(?:jpe?g|png|gif|webp|bmp|svg)(?:$|[?#])", re.IGNORECASE).search
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; SitemapParser/1.0)", "Accept-Encoding": "gzip"}
+_GZIP_MAGIC = b"\x1f\x8b"
 
 FLARESOLVERR_TIMEOUT = int(os.getenv("FLARESOLVERR_TIMEOUT", "120"))
+# Minimum spacing between sitemap request starts, across all workers
+SITEMAP_REQUEST_INTERVAL = float(os.getenv("SITEMAP_REQUEST_INTERVAL", "0.2"))
+
+# Shared with fp_fc_scraper (http_cache.ResponseCache), so the workflow can hand the
+# sitemaps fetched here to every scrape job
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+HTTP_CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", "86400"))  # seconds
+
+response_cache = ResponseCache(HTTP_CACHE_DIR, HTTP_CACHE_TTL) if HTTP_CACHE_DIR else None
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
 
 class FlareSolverrSession:
     def __init__(self):
         self.session = requests.Session()
+        # One pooled session for every call in this script, sized to the worker pool;
+        # idempotent direct GET/HEADs retry inside the adapter (POSTs are not retried)
+        adapter = HTTPAdapter(
+            pool_connections=CHUNK_GEN_WORKERS,
+            pool_maxsize=CHUNK_GEN_WORKERS,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 502, 503)),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._local = threading.local()  # per-thread PRNG; the session is shared by every worker
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
@@ -64,18 +109,24 @@ class FlareSolverrSession:
                     "headers": self.headers
                 }
                 
-                response = self.session.post(
-                    FLARESOLVERR_URL,
-                    json=payload,
-                    timeout=FLARESOLVERR_TIMEOUT
-                )
+                # orjson: the reply carries the whole page as a JSON string
+                with _fs_slots:
+                    response = self.session.post(
+                        FLARESOLVERR_URL,
+                        data=orjson.dumps(payload),
+                        headers=_JSON_HEADERS,
+                        timeout=FLARESOLVERR_TIMEOUT
+                    )
                 
                 if response.status_code == 200:
-                    result = response.json()
+                    result = orjson.loads(response.content)
                     
                     if result.get("status") == "ok":
                         solution = result.get("solution", {})
                         content = solution.get("response", "")
+                        # The target site's own status: a challenge page or a 5xx body
+                        # still comes back inside an "ok" envelope
+                        site_status = solution.get("status", 200)
                         
                         # Extract cookies for potential future requests
                         cookies = solution.get("cookies", [])
@@ -92,7 +143,7 @@ class FlareSolverrSession:
                                 if key.lower() not in ["content-length", "content-encoding", "transfer-encoding"]:
                                     self.headers[key] = value
                         
-                        return content, 200
+                        return content, site_status
                 
                 log(f"FlareSolverr attempt {attempt + 1} failed for {url}: {response.status_code}")
                 
@@ -104,20 +155,41 @@ class FlareSolverrSession:
                 log(f"FlareSolverr error on attempt {attempt + 1} for {url}: {e}")
             
             if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)  # Exponential backoff
+                time.sleep((1 << attempt) + self._rng.random())  # Exponential backoff + jitter
         
         return None, 0
 
+    @property
+    def _rng(self) -> random.Random:
+        rng = getattr(self._local, "rng", None)
+        if rng is None:
+            rng = self._local.rng = random.Random(os.urandom(8))
+        return rng
+
     def fetch(self, url: str) -> Optional[Tuple[str, int]]:
-        """Fetch URL through FlareSolverr"""
-        return self.flaresolverr_request(url)
+        """Fetch URL through FlareSolverr, serving fresh cached pages without a round trip"""
+        if response_cache:
+            cached = response_cache.get(url)
+            if cached is not None:
+                return cached, 200
+        content, status = self.flaresolverr_request(url)
+        if response_cache and content and status == 200:
+            response_cache.put(url, content)
+        return content, status
 
 flaresolverr_session = FlareSolverrSession()
 
+LOG_FLUSH = os.getenv("LOG_FLUSH", "1") == "1"
+_last_ts = [0, ""]  # [epoch second, formatted timestamp]
+
 def log(msg: str, level: str = "INFO"):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    sys.stderr.write(f"[{timestamp}] [{level}] {msg}\n")
-    sys.stderr.flush()
+    now = int(time.time())
+    if now != _last_ts[0]:
+        _last_ts[0] = now
+        _last_ts[1] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+    sys.stderr.write(f"[{_last_ts[1]}] [{level}] {msg}\n")
+    if LOG_FLUSH:
+        sys.stderr.flush()
 
 def sanitize_url_text(text: str) -> str:
     clean = re.sub(r"<[^>]+>", " ", text or "")
@@ -161,9 +233,60 @@ def check_robots_txt():
 
 
 # ---------- FETCH with fallback to FlareSolverr ----------
+_rate_lock = threading.Lock()
+_next_slot = [0.0]
+_probe_rate_lock = threading.Lock()
+_probe_next_slot = [0.0]
+
+def _wait_for_slot(lock, next_slot):
+    if SITEMAP_REQUEST_INTERVAL <= 0:
+        return
+    with lock:
+        now = time.monotonic()
+        slot = max(now, next_slot[0])
+        next_slot[0] = slot + SITEMAP_REQUEST_INTERVAL
+    if slot > now:
+        time.sleep(slot - now)
+
+def throttle():
+    """Space sitemap requests SITEMAP_REQUEST_INTERVAL apart across all workers combined."""
+    _wait_for_slot(_rate_lock, _next_slot)
+
+def probe_throttle():
+    """Same spacing for the HEAD size probes, on a schedule of their own."""
+    _wait_for_slot(_probe_rate_lock, _probe_next_slot)
+
+def open_sitemap_stream(r):
+    """Readable binary XML stream for a stream=True sitemap response.
+
+    urllib3 strips a gzip Content-Encoding as the body is read; if what is left is
+    still gzip (a .xml.gz file, or application/x-gzip) it is unwrapped here too,
+    judged by the magic bytes rather than the URL or headers.
+    """
+    r.raw.decode_content = True
+    r.raw.auto_close = False  # let the io wrapper see EOF instead of a closed file
+    body = io.BufferedReader(r.raw, buffer_size=1 << 16)
+    if body.peek(2)[:2] == _GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=body)
+    return body
+
+def fetch_gz(url):
+    """Download a gzipped sitemap directly and return the decompressed XML bytes."""
+    with flaresolverr_session.session.get(
+        url, headers=flaresolverr_session.headers, timeout=30, stream=True
+    ) as r:
+        if r.status_code != 200:
+            log(f"Failed to fetch {url}: {r.status_code}", "WARNING")
+            return None
+        return open_sitemap_stream(r).read()
+
 def fetch_xml(url):
     """Try normal GET first, fallback to FlareSolverr if needed."""
+    throttle()
     try:
+        if url.endswith(".xml.gz"):
+            # FlareSolverr would render the binary through Chrome; fetch it raw instead
+            return fetch_gz(url)
         content, status = flaresolverr_session.fetch(url)
         if status == 200:
             return content
@@ -175,13 +298,32 @@ def fetch_xml(url):
                 "maxTimeout": 30000,
                 "headers": HEADERS
             }
-            fs = requests.post(FLARESOLVERR_URL, json=payload, timeout=60)
+            with _fs_slots:
+                fs = flaresolverr_session.session.post(
+                    FLARESOLVERR_URL, data=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=60
+                )
             if fs.status_code == 200:
-                return fs.json().get("solution", {}).get("response")
+                return orjson.loads(fs.content).get("solution", {}).get("response")
     except Exception as e:
         print(f"Error fetching {url}: {e}", file=sys.stderr)
     return None
 
+def iter_locs(source):
+    """Stream <loc> texts out of sitemap XML (str, bytes or a binary file object), dropping each entry once read."""
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    for _, elem in etree.iterparse(source, events=("end",), tag=_LOC_TAGS):
+        text = elem.text.strip() if elem.text else ""
+        elem.clear()
+        entry = elem.getparent()  # <url> / <sitemap> wrapper
+        if entry is not None:
+            while entry.getprevious() is not None:
+                del entry.getparent()[0]
+        if text:
+            yield text
+
 # ---------- 1. Get sitemap index ----------
 crawl_delay, robots_sitemap = check_robots_txt()
 if robots_sitemap and robots_sitemap.startswith('http'):
@@ -193,17 +335,11 @@ if not index_xml:
     sys.exit(1)
 
 try:
-    root = ET.fromstring(index_xml)
-except ET.ParseError as e:
+    sitemap_locs = list(iter_locs(index_xml))
+except etree.XMLSyntaxError as e:
     print(f"Failed to parse sitemap index XML: {e}", file=sys.stderr)
     sys.exit(1)
 
-ns = {"ns": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-sitemap_locs = []
-for loc in root.findall(".//ns:loc", ns) or root.findall(".//loc"):
-    if loc.text:
-        sitemap_locs.append(loc.text.strip())
-
 if not sitemap_locs:
     print("No sitemaps found in index", file=sys.stderr)
     sys.exit(1)
@@ -222,62 +358,118 @@ print(f"Chunk generator workers: {CHUNK_GEN_WORKERS}")
 # ---------- 2. For each sitemap, count product URLs ----------
 sitemap_stats = []
 
+# HEAD probes are only a scheduling hint: no adapter retries, and a few threads
+# and a rate limiter of their own so counting never waits on them
+_probe_session = requests.Session()
+SIZE_PROBE_WORKERS = 2
+
+def sitemap_size(sm_url):
+    """Cheap HEAD to read Content-Length; 0 when the server doesn't say."""
+    probe_throttle()
+    try:
+        r = _probe_session.head(sm_url, headers=HEADERS, timeout=10, allow_redirects=True)
+        return int(r.headers.get("Content-Length") or 0)
+    except (requests.RequestException, ValueError):
+        return 0
+
+def count_product_urls(locs: Iterator[str]) -> int:
+    # Must match fp_fc_scraper's filter so URL_OFFSET chunks line up;
+    # stops reading as soon as MAX_URLS_PER_SITEMAP products have been seen
+    products = (u for u in locs if _KEEP_URL(u) and not _REJECT_URL(u))
+    return sum(1 for _ in islice(products, MAX_URLS_PER_SITEMAP if MAX_URLS_PER_SITEMAP > 0 else None))
+
+def count_streamed(sm_url) -> int:
+    """Count a directly downloadable (.xml.gz) sitemap while it downloads."""
+    throttle()
+    with flaresolverr_session.session.get(
+        sm_url, headers=flaresolverr_session.headers, timeout=30, stream=True
+    ) as r:
+        if r.status_code != 200:
+            log(f"Failed to fetch {sm_url}: {r.status_code}", "WARNING")
+            return 0
+        return count_product_urls(iter_locs(open_sitemap_stream(r)))
+
 def process_sitemap(sm_url):
-    xml = fetch_xml(sm_url)
-    if not xml:
-        return {"url": sm_url, "total_urls": 0}
     try:
-        root_sm = ET.fromstring(xml)
-    except ET.ParseError:
+        if sm_url.endswith(".xml.gz"):
+            return {"url": sm_url, "total_urls": count_streamed(sm_url)}
+        # FlareSolverr hands the page back whole, so there is nothing to stream here
+        xml = fetch_xml(sm_url)
+        if not xml:
+            return {"url": sm_url, "total_urls": 0}
+        return {"url": sm_url, "total_urls": count_product_urls(iter_locs(xml))}
+    except (etree.XMLSyntaxError, OSError, requests.RequestException) as e:
+        log(f"Failed to count {sm_url}: {e}", "WARNING")
         return {"url": sm_url, "total_urls": 0}
-    urls = []
-    for loc in root_sm.findall(".//ns:loc", ns) or root_sm.findall(".//loc"):
-        if loc.text and ".html" in loc.text and not any(
-            ext in loc.text for ext in [".jpg", ".jpeg", ".png", ".gif", ".webp"]
-        ):
-            urls.append(loc.text.strip())
-    total = len(urls)
-    if MAX_URLS_PER_SITEMAP > 0 and total > MAX_URLS_PER_SITEMAP:
-        total = MAX_URLS_PER_SITEMAP
-    return {"url": sm_url, "total_urls": total}
+
+sizes: Dict[str, int] = {}
+pending_locs = list(sitemap_locs)
+_pick_lock = threading.Lock()
+
+def process_next_sitemap():
+    """Count the largest sitemap probed so far (LPT) so one huge file doesn't start last
+    and set the wall time; sitemaps not probed yet rank as size 0."""
+    with _pick_lock:
+        best = max(range(len(pending_locs)), key=lambda i: sizes.get(pending_locs[i], 0))
+        sm_url = pending_locs.pop(best)
+    return process_sitemap(sm_url)
+
+def probe_size(sm_url):
+    sizes[sm_url] = sitemap_size(sm_url)
 
 worker_count = max(1, min(CHUNK_GEN_WORKERS, len(sitemap_locs)))
-with ThreadPoolExecutor(max_workers=worker_count) as executor:
-    futures = [executor.submit(process_sitemap, url) for url in sitemap_locs]
-    for future in as_completed(futures):
-        sitemap_stats.append(future.result())
-        time.sleep(0.2)  # be polite
+probes = ThreadPoolExecutor(max_workers=SIZE_PROBE_WORKERS)
+try:
+    for url in sitemap_locs:
+        probes.submit(probe_size, url)
+    with ThreadPoolExecutor(max_workers=worker_count) as executor:
+        futures = [executor.submit(process_next_sitemap) for _ in sitemap_locs]
+        for future in as_completed(futures):
+            sitemap_stats.append(future.result())
+finally:
+    probes.shutdown(wait=False, cancel_futures=True)  # hints are moot once everything is counted
 
 # ---------- 3. Generate chunks (one matrix entry per chunk) ----------
-chunks = []
-chunk_id = 0
-for sm in sitemap_stats:
-    total = sm["total_urls"]
-    if total == 0:
-        continue
-    num_chunks = (total + URLS_PER_JOB - 1) // URLS_PER_JOB
-    for i in range(num_chunks):
-        offset = i * URLS_PER_JOB
-        limit = min(URLS_PER_JOB, total - offset)
-        chunks.append(
-            {
+def iter_chunks(stats):
+    chunk_id = 0
+    for sm in stats:
+        total = sm["total_urls"]
+        if total == 0:
+            continue
+        num_chunks = (total + URLS_PER_JOB - 1) // URLS_PER_JOB
+        for i in range(num_chunks):
+            offset = i * URLS_PER_JOB
+            limit = min(URLS_PER_JOB, total - offset)
+            yield {
                 "sitemap_url": sm["url"],
                 "offset": offset,
                 "limit": limit,
                 "chunk_id": chunk_id,
                 "base_url": CURR_URL,
             }
-        )
-        chunk_id += 1
-
-print(f"Generated {len(chunks)} chunks")
+            chunk_id += 1
 
 # ---------- 4. Output matrix to GITHUB_OUTPUT ----------
-matrix_json = json.dumps(chunks)
+def write_matrix(out) -> int:
+    """Stream the matrix as one JSON array, element by element; returns the chunk count."""
+    out.write(b"matrix=[")
+    count = 0
+    for chunk in iter_chunks(sitemap_stats):
+        if count:
+            out.write(b",")
+        out.write(orjson.dumps(chunk))
+        count += 1
+    out.write(b"]\n")
+    return count
+
 github_output = os.environ.get("GITHUB_OUTPUT")
 if github_output:
-    with open(github_output, "a") as f:
-        f.write(f"matrix={matrix_json}\n")
+    with open(github_output, "ab", buffering=1 << 20) as f:
+        chunk_count = write_matrix(f)
 else:
     # When running locally, just print
-    print(f"matrix={matrix_json}")
+    sys.stdout.flush()  # earlier print() output must land before the raw bytes
+    chunk_count = write_matrix(sys.stdout.buffer)
+    sys.stdout.buffer.flush()
+
+print(f"Generated {chunk_count} chunks")
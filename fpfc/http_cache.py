@@ -0,0 +1,44 @@
+"""On-disk HTTP response cache shared by generate_chunks.py and fp_fc_scraper.py.
+
+The generator fills it with robots.txt and sitemaps, and the workflow hands the
+directory to every scrape job, so both scripts must agree on the key and layout.
+"""
+import os
+import time
+import hashlib
+import threading
+from typing import Callable, Optional
+
+
+class ResponseCache:
+    """One file per URL (sha1 of the URL), expired by mtime after ttl seconds."""
+
+    def __init__(self, root: str, ttl: int, on_error: Optional[Callable[[str], None]] = None):
+        self.root = root
+        self.ttl = ttl
+        self.on_error = on_error  # called with a message when a write fails
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+    def get(self, url: str) -> Optional[str]:
+        path = self._path(url)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, url: str, content: str):
+        path = self._path(url)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp, path)  # readers never see a partial file
+        except OSError as e:
+            if self.on_error:
+                self.on_error(f"Response cache write failed for {url}: {e}")
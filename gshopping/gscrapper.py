@@ -8,15 +8,20 @@ from selenium.webdriver.common.action_chains import ActionChains
 import time
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
 from selenium.webdriver.common.keys import Keys
 import undetected_chromedriver as uc
 import os
 from solvecaptcha import solve_recaptcha_audio
 import csv
 import traceback
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 
 DRIVER_RESTART_THRESHOLD = 30
+# Concurrent Chrome instances; each worker thread owns one driver
+SCRAPER_WORKERS = int(os.getenv("SCRAPER_WORKERS", "5"))
 
 def swipe_element(driver, element, start_x, start_y, end_x, end_y, duration=1000):
     driver.execute_script("arguments[0].scrollIntoView();", element)
@@ -39,6 +44,17 @@ def safe_click(driver, element):
             except Exception:
                 return False
 
+BLOCKED_URL_PATTERNS = [
+    "*doubleclick.net*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*googlesyndication.com*",
+    "*googleadservices.com*",
+    "*.woff*",
+]
+
+_driver_start_lock = threading.Lock()
+
 def setup_driver(max_attempts=3, base_delay=5):
     # if os.getenv("GITHUB_ACTIONS") != "true":
     #     os.system("pkill chrome")
@@ -60,12 +76,19 @@ def setup_driver(max_attempts=3, base_delay=5):
             options.add_argument("--disable-popup-blocking")
             options.add_argument("--disable-logging")
             options.add_argument("--log-level=3")
-            options.add_argument("--remote-debugging-port=9222")
             options.add_argument("--disable-background-timer-throttling")
             options.add_argument("--disable-backgrounding-occluded-windows")
             options.add_argument("--disable-ipc-flooding-protection")
             options.add_argument("--enable-features=NetworkService,NetworkServiceInProcess")
             options.add_argument("--disable-renderer-backgrounding")
+            # Result grids are scraped from the DOM; tile images and web fonts are just bytes on the wire
+            options.add_argument("--blink-settings=imagesEnabled=false")
+            options.add_experimental_option("prefs", {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.default_content_setting_values.fonts": 2,
+            })
+            # driver.get returns at DOMContentLoaded; callers already wait for the elements they need
+            options.page_load_strategy = "eager"
 
             user_agents = [
                 "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/122.0.0.0 Safari/537.36",
@@ -79,8 +102,14 @@ def setup_driver(max_attempts=3, base_delay=5):
             options.add_argument(f"--user-agent={random.choice(user_agents)}")
             options.add_argument(f"--window-size={width},{height}")
 
-            # Let undetected_chromedriver auto-detect the correct version
-            return uc.Chrome(options=options)
+            # Let undetected_chromedriver auto-detect the correct version.
+            # uc patches one shared chromedriver binary, so workers start one at a time.
+            with _driver_start_lock:
+                driver = uc.Chrome(options=options)
+            # Trackers and ads never carry result data; drop them before they reach the network
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+            return driver
         except Exception as exc:
             last_error = exc
             print(f"Driver start failed (attempt {attempt}/{max_attempts}): {str(exc)}")
@@ -89,6 +118,18 @@ def setup_driver(max_attempts=3, base_delay=5):
 
     raise last_error
 
+def wait_for_results_or_captcha(driver, timeout=15):
+    # The eager load strategy returns before Google has rendered either the results
+    # or the captcha, so give one of them a chance to show up before checking
+    try:
+        WebDriverWait(driver, timeout).until(EC.any_of(
+            EC.presence_of_element_located((By.CLASS_NAME, "dURPMd")),
+            EC.presence_of_element_located((By.CSS_SELECTOR, "iframe[src*='recaptcha']")),
+            EC.presence_of_element_located((By.CLASS_NAME, "rc-imageselect-challenge")),
+        ))
+    except TimeoutException:
+        pass
+
 def detects_recaptcha(driver):
     try:
         if driver.find_elements(By.CLASS_NAME, "rc-imageselect-challenge"):
@@ -122,6 +163,7 @@ def start_new_driver(search_url):
             pass
         driver = setup_driver()
         driver.get(search_url)
+        wait_for_results_or_captcha(driver)
         recaptcha = detects_recaptcha(driver)
         if not recaptcha:
             return driver
@@ -222,33 +264,22 @@ def save_to_csv(data, filename, headers=None):
     os.makedirs('scraping_results', exist_ok=True)
     filepath = os.path.join('scraping_results', filename)
     
-    # If no headers provided, extract from all dictionaries
-    if headers is None:
-        # Collect all unique keys from all dictionaries
-        all_keys = set()
-        for item in data:
-            if isinstance(item, dict):
-                all_keys.update(item.keys())
-        headers = list(all_keys)
-    elif isinstance(data[0], dict):
-        # Ensure all dictionaries have the same structure
-        # Add any missing keys to make all dictionaries consistent
-        all_keys = set(headers)
+    if isinstance(data[0], dict):
+        # One pass for the union of keys; dict.fromkeys keeps first-seen column order,
+        # starting with any headers the caller asked for
+        columns = dict.fromkeys(headers or ())
         for item in data:
             if isinstance(item, dict):
-                all_keys.update(item.keys())
-        headers = list(all_keys)
+                columns.update(dict.fromkeys(item))
+        headers = list(columns)
     
-    with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+    # One large buffer: the summaries are written in a single go, so flush once at close
+    with open(filepath, 'w', newline='', encoding='utf-8', buffering=1 << 20) as csvfile:
         if isinstance(data[0], dict):
-            writer = csv.DictWriter(csvfile, fieldnames=headers)
+            # restval fills keys a row lacks, so rows are written as they are
+            writer = csv.DictWriter(csvfile, fieldnames=headers, restval='')
             writer.writeheader()
-            for row in data:
-                # Ensure all rows have all headers (fill missing with empty strings)
-                for header in headers:
-                    if header not in row:
-                        row[header] = ''
-                writer.writerow(row)
+            writer.writerows(data)
         else:
             writer = csv.writer(csvfile)
             writer.writerows(data)
@@ -257,6 +288,7 @@ def save_to_csv(data, filename, headers=None):
 
 def scrape_google_keyword_competitior(url, product_id, keyword, driver, all_results):
     driver.get(url)
+    wait_for_results_or_captcha(driver)
     recaptcha = detects_recaptcha(driver)
     if recaptcha:
         result = solve_recaptcha_audio(driver)
@@ -486,6 +518,102 @@ def load_product_urls(filepath='product_urls.json'):
         ''')
         return []
 
+_local = threading.local()
+_drivers = set()  # every worker's live driver, quit at shutdown
+_drivers_lock = threading.Lock()
+
+def _use_driver(driver):
+    """Make driver this thread's driver, quitting the one it replaces."""
+    old = getattr(_local, "driver", None)
+    with _drivers_lock:
+        _drivers.discard(old)
+        _drivers.add(driver)
+    _local.driver = driver
+    if old is not None and old is not driver:
+        try:
+            old.quit()
+        except Exception:
+            pass
+
+def _thread_driver():
+    if getattr(_local, "driver", None) is None:
+        _local.processed = 0
+        _use_driver(setup_driver())
+    return _local.driver
+
+_pause_lock = threading.Lock()
+_pause_until = 0.0  # monotonic deadline every worker waits out before its next search
+
+def _pause_all_workers(seconds):
+    global _pause_until
+    with _pause_lock:
+        _pause_until = max(_pause_until, time.monotonic() + seconds)
+
+def _wait_for_pause():
+    with _pause_lock:
+        delay = _pause_until - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+def quit_all_drivers():
+    with _drivers_lock:
+        drivers = list(_drivers)
+        _drivers.clear()
+    for driver in drivers:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+def scrape_one(i, total, product):
+    """Scrape one product on this thread's driver; returns its own products/competitors lists."""
+    results = {
+        'products': [],
+        'competitors': []
+    }
+    product_id = product.get('product_id', i)
+    try:
+        url = product['url']
+        keyword = product['keyword']
+
+        print(f"\n{'='*60}")
+        print(f"Scraping {i}/{total}")
+        print(f"Product ID: {product_id}")
+        print(f"Keyword: {keyword}")
+        print(f"URL: {url[:100]}...")
+        print(f"{'='*60}")
+
+        if i % 10 == 0:
+            print(f"Pausing all workers for 30 seconds after 10 products...")
+            _pause_all_workers(30)
+
+        _wait_for_pause()
+        time.sleep(random.uniform(3, 6))
+
+        driver = _thread_driver()
+        # A captcha the solver gives up on hands back a fresh driver
+        _use_driver(scrape_google_keyword_competitior(url, product_id, keyword, driver, results))
+        _local.processed += 1
+
+        if _local.processed % DRIVER_RESTART_THRESHOLD == 0:
+            print("Restarting driver to avoid detection / memory leak")
+            time.sleep(random.uniform(3, 6))
+            _use_driver(setup_driver(max_attempts=3, base_delay=5))
+
+    except Exception as e:
+        print(f"Error scraping product {product_id}: {str(e)}")
+        traceback.print_exc()
+        print("Reinitializing driver...")
+        try:
+            _use_driver(setup_driver())
+        except Exception as exc:
+            print(f"Driver restart failed: {exc}")
+
+    finally:
+        now = datetime.now()
+        print(f"Progress: {i}/{total} - {now.strftime('%Y-%m-%d %H:%M:%S')}")
+    return results
+
 def main():
     # Create results directory
     os.makedirs('scraping_results', exist_ok=True)
@@ -504,53 +632,15 @@ def main():
         'competitors': []
     }
     
-    driver = setup_driver()
-    processed_count = 0
-    
-    for i, product in enumerate(products, 1):
-        try:
-            product_id = product.get('product_id', i)
-            url = product['url']
-            keyword = product['keyword']
-            
-            print(f"\n{'='*60}")
-            print(f"Scraping {i}/{len(products)}")
-            print(f"Product ID: {product_id}")
-            print(f"Keyword: {keyword}")
-            print(f"URL: {url[:100]}...")
-            print(f"{'='*60}")
-            
-            if i % 10 == 0:
-                print(f"Taking a 30-second break after 10 products...")
-                time.sleep(30)
-            
-            time.sleep(random.uniform(3, 6))
-            
-            driver = scrape_google_keyword_competitior(url, product_id, keyword, driver, all_results)
-            processed_count += 1
-
-            if processed_count % DRIVER_RESTART_THRESHOLD == 0:
-                print("Restarting driver to avoid detection / memory leak")
-                try:
-                    driver.quit()
-                except Exception:
-                    pass
-                time.sleep(random.uniform(3, 6))
-                driver = setup_driver(max_attempts=3, base_delay=5)
-            
-        except Exception as e:
-            print(f"Error scraping product {product_id}: {str(e)}")
-            traceback.print_exc()
-            print("Reinitializing driver...")
-            try:
-                driver.quit()
-            except:
-                pass
-            driver = setup_driver()
-        
-        finally:
-            now = datetime.now()
-            print(f"Progress: {i}/{len(products)} - {now.strftime('%Y-%m-%d %H:%M:%S')}")
+    total = len(products)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, SCRAPER_WORKERS)) as executor:
+            # map keeps input order, so the summaries list products as product_urls.json does
+            for results in executor.map(scrape_one, range(1, total + 1), repeat(total), products):
+                all_results['products'].extend(results['products'])
+                all_results['competitors'].extend(results['competitors'])
+    finally:
+        quit_all_drivers()
     
     # Save summary files
     if all_results['products']:
@@ -571,8 +661,6 @@ def main():
     print(f"Competitors found: {len(all_results['competitors'])}")
     print(f"Results saved to: scraping_results/")
     print(f"Summary file: scraping_summary.json")
-    
-    driver.quit()
 
 if __name__ == "__main__":
     IS_CI = os.getenv("GITHUB_ACTIONS") == "true"
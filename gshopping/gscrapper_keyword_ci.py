@@ -1,16 +1,28 @@
 import argparse
 import csv
+import fcntl
 import os
 import random
+import tempfile
 import time
 import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import repeat
 from urllib.parse import quote_plus
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import (
+    ElementClickInterceptedException,
+    ElementNotInteractableException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+)
 
 from gscrapperci import (
     setup_driver,
@@ -20,6 +32,16 @@ from gscrapperci import (
 )
 
 
+def wait(driver, timeout=8):
+    # 100 ms polls instead of Selenium's 500 ms default; cards re-render while we poll
+    return WebDriverWait(
+        driver,
+        timeout,
+        poll_frequency=0.1,
+        ignored_exceptions=(NoSuchElementException, StaleElementReferenceException),
+    )
+
+
 def build_search_url(keyword):
     return f"https://www.google.com/search?q={quote_plus(keyword)}&udm=28&gl=US&hl=en&pws=0"
 
@@ -31,11 +53,93 @@ def get_text_safe(element, by, selector):
         return ""
 
 
-def get_attr_safe(element, by, selector, attr):
+# One round trip per page instead of several WebDriver commands per card/offer;
+# the selectors are the same ones the per-element lookups used.
+_CARDS_JS = """
+const out = [];
+for (const c of document.getElementsByClassName('MtXiu')) {
+    const n = c.querySelector('div.gkQHve');
+    const s = c.querySelector('span.WJMUdc');
+    out.push([c.id || '', n ? n.innerText.trim() : '', s ? s.innerText.trim() : '']);
+}
+return out;
+"""
+
+_OFFERS_JS = """
+const text = (el, sel) => { const e = el.querySelector(sel); return e ? e.innerText.trim() : ''; };
+const out = [];
+for (const o of arguments[0].getElementsByClassName('R5K7Cb')) {
+    const a = o.querySelector('a.P9159d');
+    out.push([
+        text(o, 'div.hP4iBf.gUf0b.uWvFpd'),
+        text(o, 'div.Rp8BL'),
+        a ? a.href : '',
+        text(o, "div.QcEgce span[aria-hidden='true']") || text(o, 'div.GBgquf span'),
+    ]);
+}
+return out;
+"""
+
+# Locators shared by the waits and finds below; CSS class selectors use the browser's
+# class index, where XPath contains(@class, ...) scans every class attribute.
+RESULTS_SEL = (By.CLASS_NAME, "dURPMd")
+NAME_SEL = (By.CSS_SELECTOR, "div.gkQHve")
+SELLER_SEL = (By.CSS_SELECTOR, "span.WJMUdc")
+SHARE_BUTTON_SEL = (By.CSS_SELECTOR, "div.RSNrZe[role='button'][aria-label='Share']")
+SHARE_DIALOG_SEL = (By.CSS_SELECTOR, "div[role='dialog'][aria-label='Share']")
+MORE_STORES_SEL = (By.CSS_SELECTOR, "div.duf-h div[role='button']")
+OFFERS_GRID_SEL = (By.CSS_SELECTOR, "div[jsname='RSFNod'][data-attrid='organic_offers_grid']")
+OPTIONS_SEL = (By.CSS_SELECTOR, "div.iI1aN div[class='EDblX kjqWgb']")
+
+# Reads the share link (input value, else the link text) and closes the dialog in one call
+_SHARE_DIALOG_JS = """
+const d = arguments[0];
+const input = d.querySelector("input[aria-label='Share link'][type='url']");
+let url = input ? (input.value || '').trim() : '';
+if (!url) {
+    const div = d.querySelector("div[jsname='tQ9n1c']");
+    url = div ? div.innerText.trim() : '';
+}
+const close = d.querySelector("[jsname='tqp7ud']");
+if (close) close.click();
+return [url, !!close];
+"""
+
+# Counting or listing ids returns plain values; find_elements would marshal one
+# element handle per card on every poll.
+_CARD_COUNT_JS = "return document.getElementsByClassName('MtXiu').length;"
+_CARD_IDS_FROM_JS = "return Array.from(document.getElementsByClassName('MtXiu'), c => c.id || '').slice(arguments[0]);"
+_CARD_AT_JS = "return document.getElementsByClassName('MtXiu')[arguments[0]] || null;"
+
+# Clicks "More stores" until it is gone, waiting in the page for each batch of offer rows;
+# the whole expansion is one async script call.
+_EXPAND_STORES_JS = """
+const [selector, maxClicks, done] = arguments;
+const count = () => document.getElementsByClassName('R5K7Cb').length;
+(async () => {
+    for (let i = 0; i < maxClicks; i++) {
+        const button = document.querySelector(selector);
+        if (!button) return done(i);
+        const before = count();
+        button.click();
+        const start = Date.now();
+        while (count() <= before && Date.now() - start < 3000) {
+            await new Promise(r => setTimeout(r, 100));
+        }
+        if (count() <= before) return done(i + 1);
+    }
+    done(maxClicks);
+})();
+"""
+
+
+def wait_for_growth(driver, count_js, previous, timeout):
+    """Wait until count_js reports more than previous; False if it never does within timeout."""
     try:
-        return element.find_element(by, selector).get_attribute(attr)
-    except Exception:
-        return ""
+        wait(driver, timeout).until(lambda d: (d.execute_script(count_js) or 0) > previous)
+        return True
+    except TimeoutException:
+        return False
 
 
 def normalize_name_key(name):
@@ -46,8 +150,7 @@ def scroll_results_to_bottom(driver, max_products=0, idle_rounds=5, max_rounds=1
     last_count = -1
     stable = 0
     for _ in range(max_rounds):
-        cards = driver.find_elements(By.CLASS_NAME, "MtXiu")
-        count = len(cards)
+        count = driver.execute_script(_CARD_COUNT_JS) or 0
         if max_products > 0 and count >= max_products:
             break
         if count == last_count:
@@ -59,23 +162,20 @@ def scroll_results_to_bottom(driver, max_products=0, idle_rounds=5, max_rounds=1
             break
         # Incremental scrolling works better with lazy-loaded result cards.
         driver.execute_script("window.scrollBy(0, Math.max(700, window.innerHeight * 0.85));")
-        time.sleep(random.uniform(0.8, 1.5))
+        wait_for_growth(driver, _CARD_COUNT_JS, count, 1.5)
 
 
 def collect_all_products(driver, keyword, search_url, max_products=0):
-    WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.CLASS_NAME, "dURPMd")))
+    wait(driver, 20).until(EC.presence_of_element_located(RESULTS_SEL))
     scroll_results_to_bottom(driver, max_products=max_products)
 
     # mains = driver.find_element(By.CLASS_NAME, "dURPMd")
-    products = driver.find_elements(By.CLASS_NAME, "MtXiu")
+    cards = driver.execute_script(_CARDS_JS) or []
     if max_products > 0:
-        products = products[:max_products]
+        cards = cards[:max_products]
 
     collected = []
-    for idx, product in enumerate(products, start=1):
-        cid = product.get_attribute("id") or ""
-        product_name = get_text_safe(product, By.XPATH, ".//div[contains(@class,'gkQHve')]")
-        seller = get_text_safe(product, By.XPATH, ".//span[contains(@class,'WJMUdc')]")
+    for idx, (cid, product_name, seller) in enumerate(cards, start=1):
         if not cid:
             continue
         collected.append(
@@ -101,8 +201,8 @@ def chunk_slice(items, chunk_id, total_chunks):
     return items[start_idx:end_idx], start_idx, end_idx
 
 
-def click_product_by_offset(driver, start_offset, target_name="", processed_names=None):
-    processed_names = processed_names or set()
+def click_product_by_offset(driver, start_offset, target_cid="", target_name="", processed_cids=None):
+    processed_cids = processed_cids or set()
     target_key = normalize_name_key(target_name)
     current_offset = max(0, start_offset)
 
@@ -110,88 +210,85 @@ def click_product_by_offset(driver, start_offset, target_name="", processed_name
     stale_rounds = 0
     for _ in range(45):
         try:
-            cards = driver.find_elements(By.CLASS_NAME, "MtXiu")
-            count = len(cards)
+            cids = driver.execute_script(_CARD_IDS_FROM_JS, current_offset) or []
+            count = current_offset + len(cids)
             if count == last_count:
                 stale_rounds += 1
             else:
                 stale_rounds = 0
                 last_count = count
 
-            while current_offset < len(cards):
-                card = cards[current_offset]
-                card_name = get_text_safe(card, By.XPATH, ".//div[contains(@class,'gkQHve')]")
-                card_name_key = normalize_name_key(card_name)
-
-                if card_name_key and card_name_key in processed_names:
+            # Card ids can change when the results re-render; while the target id is
+            # not among the loaded cards, fall back to matching on the product name.
+            match_cid = bool(target_cid) and (target_cid in cids or not target_key)
+            for cid in cids:
+                # The card id is stable within a render, so processed and non-target cards are skipped
+                # without touching their elements; only the clicked card is fetched.
+                if cid and cid in processed_cids:
                     current_offset += 1
                     continue
-
-                if target_key and card_name_key and card_name_key != target_key:
+                if match_cid and cid != target_cid:
                     current_offset += 1
                     continue
 
+                card = driver.execute_script(_CARD_AT_JS, current_offset)
+                if card is None:
+                    break
+                card_name = get_text_safe(card, *NAME_SEL)
+                if not match_cid and target_key:
+                    card_name_key = normalize_name_key(card_name)
+                    if card_name_key and card_name_key != target_key:
+                        current_offset += 1
+                        continue
+
                 driver.execute_script("arguments[0].scrollIntoView({block:'center'});", card)
-                time.sleep(0.4)
                 try:
-                    WebDriverWait(driver, 5).until(EC.element_to_be_clickable(card))
+                    wait(driver, 5).until(EC.element_to_be_clickable(card))
                 except Exception:
                     pass
                 card.click()
                 return {
-                    "cid": card.get_attribute("id") or "",
+                    "cid": cid,
                     "product_name": card_name,
-                    "seller": get_text_safe(card, By.XPATH, ".//span[contains(@class,'WJMUdc')]"),
+                    "seller": get_text_safe(card, *SELLER_SEL),
                 }, current_offset + 1
 
             if stale_rounds >= 4:
                 break
             driver.execute_script("window.scrollBy(0, Math.max(650, window.innerHeight * 0.8));")
-            time.sleep(random.uniform(0.7, 1.3))
-        except Exception:
-            time.sleep(0.6)
+            wait_for_growth(driver, _CARD_COUNT_JS, count, 1.3)
+        except StaleElementReferenceException:
+            # The grid re-rendered under us; the next round re-reads the ids straight away
+            continue
+        except (ElementClickInterceptedException, ElementNotInteractableException):
+            driver.execute_script("window.scrollBy(0, 200);")
+            continue
     return None, current_offset
 
 
 def extract_share_url(driver):
     share_url = ""
     try:
-        share_button = WebDriverWait(driver, 8).until(
-            EC.element_to_be_clickable(
-                (By.XPATH, "//div[contains(@class,'RSNrZe') and @role='button' and @aria-label='Share']")
-            )
+        share_button = wait(driver, 8).until(
+            EC.element_to_be_clickable(SHARE_BUTTON_SEL)
         )
         driver.execute_script("arguments[0].scrollIntoView({block:'center'});", share_button)
         share_button.click()
 
-        share_dialog = WebDriverWait(driver, 8).until(
-            EC.visibility_of_element_located((By.XPATH, "//div[@role='dialog' and @aria-label='Share']"))
+        share_dialog = wait(driver, 8).until(
+            EC.visibility_of_element_located(SHARE_DIALOG_SEL)
         )
 
-        try:
-            share_input = share_dialog.find_element(By.CSS_SELECTOR, "input[aria-label='Share link'][type='url']")
-            share_url = (share_input.get_attribute("value") or "").strip()
-        except Exception:
-            share_url = ""
-
-        if not share_url:
-            try:
-                share_url = share_dialog.find_element(By.CSS_SELECTOR, "div[jsname='tQ9n1c']").text.strip()
-            except Exception:
-                share_url = ""
-
-        try:
-            close_button = share_dialog.find_element(By.CSS_SELECTOR, "[jsname='tqp7ud']")
-            close_button.click()
-        except Exception:
+        share_url, closed = driver.execute_script(_SHARE_DIALOG_JS, share_dialog)
+        if not closed:
             ActionChains(driver).send_keys(u"\ue00c").perform()  # ESC
     except Exception:
         share_url = ""
     return share_url
 
 
-def scrape_product_for_meta(driver, meta, search_url, start_offset=0, processed_names=None):
-    processed_names = processed_names or set()
+def scrape_product_for_meta(driver, meta, search_url, start_offset=0, processed_cids=None):
+    processed_cids = processed_cids or set()
     result = {
         "product_id": meta["product_id"],
         "keyword": meta["keyword"],
@@ -216,8 +313,9 @@ def scrape_product_for_meta(driver, meta, search_url, start_offset=0, processed_
         clicked_meta, next_offset = click_product_by_offset(
             driver,
             start_offset=start_offset,
+            target_cid=meta.get("cid", ""),
             target_name=meta.get("product_name", ""),
-            processed_names=processed_names,
+            processed_cids=processed_cids,
         )
         if not clicked_meta:
             result["status"] = "product_not_clickable"
@@ -233,72 +331,59 @@ def scrape_product_for_meta(driver, meta, search_url, start_offset=0, processed_
         if clicked_meta.get("cid"):
             result["cid"] = clicked_meta["cid"]
 
-        time.sleep(random.uniform(1.0, 2.0))
-        result["product_url"] = extract_share_url(driver) or driver.current_url
-
-        # Expand all available store rows before collecting seller data.
-        max_more_store_clicks = 30
-        for _ in range(max_more_store_clicks):
-            try:
-                more_stores = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((By.XPATH, "//div[contains(@class,'duf-h')]//div[@role='button']"))
-                )
-                driver.execute_script("arguments[0].scrollIntoView({block:'center'});", more_stores)
-                more_stores.click()
-                time.sleep(random.uniform(1.0, 1.8))
-            except Exception:
-                break
+        # A product page URL is already canonical; only a search URL needs the Share dialog,
+        # which costs up to three waits and two clicks. The offers-grid wait below covers
+        # the panel load either way.
+        current_url = driver.current_url
+        if "/shopping/product/" in current_url:
+            result["product_url"] = current_url
+        else:
+            result["product_url"] = extract_share_url(driver) or current_url
 
-        offers_grid = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, "//div[@jsname='RSFNod' and @data-attrid='organic_offers_grid']"))
+        offers_grid = wait(driver, 10).until(
+            EC.presence_of_element_located(OFFERS_GRID_SEL)
         )
+        # Expand all available store rows before collecting seller data.
+        driver.execute_async_script(_EXPAND_STORES_JS, MORE_STORES_SEL[1], 30)
 
-        if driver.find_elements(By.XPATH, "//div[contains(@class,'iI1aN')]//div[@class='EDblX kjqWgb']"):
+        if driver.find_elements(*OPTIONS_SEL):
             result["options"] = get_product_options(driver)
 
-        offer_elements = offers_grid.find_elements(By.CLASS_NAME, "R5K7Cb")
-        competitors = []
-        for seller_html in offer_elements:
-            store_name = get_text_safe(seller_html, By.CSS_SELECTOR, "div.hP4iBf.gUf0b.uWvFpd") or "N/A"
-            seller_product_name = get_text_safe(seller_html, By.CSS_SELECTOR, "div.Rp8BL") or "N/A"
-            seller_url = get_attr_safe(seller_html, By.CSS_SELECTOR, "a.P9159d", "href") or "N/A"
-            seller_price = (
-                get_text_safe(seller_html, By.CSS_SELECTOR, "div.QcEgce span[aria-hidden='true']")
-                or get_text_safe(seller_html, By.CSS_SELECTOR, "div.GBgquf span")
-                or "N/A"
-            )
-
+        # Expanding the store list can re-render the grid; look it up again so the
+        # handle isn't stale
+        offers_grid = wait(driver, 10).until(
+            EC.presence_of_element_located(OFFERS_GRID_SEL)
+        )
+        offers = driver.execute_script(_OFFERS_JS, offers_grid) or []
+        competitors = result["competitors"]
+        search_seller = "1StopBedrooms"
+        osb_position = 0
+        osb_id = ""
+        fetched_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")  # one grid read, one timestamp
+        for store_name, seller_product_name, seller_url, seller_price in offers:
             competitor_data = {
                 "product_id": meta["product_id"],
-                "seller": store_name,
-                "seller_product_name": seller_product_name,
-                "seller_url": seller_url,
-                "seller_price": seller_price,
-                "last_fetched_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "seller": store_name or "N/A",
+                "seller_product_name": seller_product_name or "N/A",
+                "seller_url": seller_url or "N/A",
+                "seller_price": seller_price or "N/A",
+                "last_fetched_date": fetched_at,
             }
             competitors.append(competitor_data)
-            result["competitors"].append(competitor_data)
-
-        search_seller = "1StopBedrooms"
-        sellers = [c["seller"] for c in competitors]
-        osb_position = sellers.index(search_seller) + 1 if search_seller in sellers else 0
-        osb_id = ""
-        if osb_position:
-            for competitor in competitors:
-                if competitor["seller"] == search_seller:
-                    osb_id = normalize_url_path_slug(competitor.get("seller_url", ""))
-                    break
+            if not osb_position and store_name == search_seller:
+                osb_position = len(competitors)
+                osb_id = normalize_url_path_slug(competitor_data["seller_url"])
 
         result.update(
             {
                 "osb_position": osb_position,
-                "seller_count": len(sellers),
+                "seller_count": len(competitors),
                 "osb_id": osb_id,
                 "status": "completed",
-                "last_response": f"Completed - OSB Position: {osb_position}, Total Sellers: {len(sellers)}",
+                "last_response": f"Completed - OSB Position: {osb_position}, Total Sellers: {len(competitors)}",
             }
         )
-        if len(sellers) == 0:
+        if not competitors:
             result["product_url"] = ""
         return result, next_offset
     except Exception as e:
@@ -307,7 +392,23 @@ def scrape_product_for_meta(driver, meta, search_url, start_offset=0, processed_
     return result, start_offset
 
 
-def append_product_row(csv_path, result):
+PRODUCT_FIELDS = [
+    "product_id", "keyword", "url", "osb_url", "last_response", "osb_url_match", "product_url",
+    "seller", "product_name", "cid", "pid", "last_fetched_date", "osb_position", "osb_id",
+    "seller_count", "status",
+]
+SELLER_FIELDS = ["product_id", "seller", "seller_product_name", "seller_url", "seller_price", "last_fetched_date"]
+
+
+def open_csv_writer(csv_path, fields, **kwargs):
+    """Open csv_path once for the whole chunk (64 KiB buffer) and write the header."""
+    f = open(csv_path, "w", newline="", encoding="utf-8", buffering=1 << 16)
+    writer = csv.DictWriter(f, fieldnames=fields, **kwargs)
+    writer.writeheader()
+    return f, writer
+
+
+def append_product_row(writer, result):
     osb_id = result.get('osb_id', '')
     osb_url = f"https://www.1stopbedrooms.com/{osb_id}" if osb_id else ""
     row = {
@@ -334,29 +435,36 @@ def append_product_row(csv_path, result):
         "seller_count": result.get("seller_count", 0),
         "status": result.get("status", "error"),
     }
+    writer.writerow(row)
+
 
-    file_exists = os.path.exists(csv_path)
-    with open(csv_path, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=list(row.keys()))
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(row)
+def append_seller_rows(writer, competitors):
+    # writer is built with restval="" / extrasaction="ignore", so rows go in as they are
+    writer.writerows(competitors)
 
 
-def append_seller_rows(csv_path, competitors):
-    if not competitors:
-        return
-    file_exists = os.path.exists(csv_path)
-    fields = ["product_id", "seller", "seller_product_name", "seller_url", "seller_price", "last_fetched_date"]
-    with open(csv_path, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
-        if not file_exists:
-            writer.writeheader()
-        for row in competitors:
-            writer.writerow({k: row.get(k, "") for k in fields})
+@contextmanager
+def driver_start_lock():
+    # undetected_chromedriver patches one shared chromedriver binary on start-up, and
+    # --workers starts drivers in separate processes, so serialize through a file lock
+    path = os.path.join(tempfile.gettempdir(), "gscrapper_uc_start.lock")
+    with open(path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 
+def start_driver():
+    with driver_start_lock():
+        driver = setup_driver()
+    driver.implicitly_wait(0)  # explicit waits only, so the two never stack
+    driver.set_script_timeout(120)  # store expansion: up to 30 clicks x 3 s inside one script
+    return driver
 
-def process_keyword_chunk(keyword, chunk_id, total_chunks, max_products=0):
+
+def process_keyword_chunk(keyword, chunk_id, total_chunks, max_products=0, driver=None):
     search_url = build_search_url(keyword)
     print(f"Keyword: {keyword}")
     print(f"Search URL: {search_url}")
@@ -367,7 +475,10 @@ def process_keyword_chunk(keyword, chunk_id, total_chunks, max_products=0):
     csv1_path = os.path.join(output_dir, f"product_info_chunk{chunk_id}_{timestamp}.csv")
     csv2_path = os.path.join(output_dir, f"seller_info_chunk{chunk_id}_{timestamp}.csv")
 
-    driver = setup_driver()
+    # A caller-supplied driver is reused across keywords and left running for the caller
+    owns_driver = driver is None
+    if owns_driver:
+        driver = start_driver()
     try:
         driver.get(search_url)
         captcha_result = handle_captcha(driver, search_url)
@@ -387,29 +498,33 @@ def process_keyword_chunk(keyword, chunk_id, total_chunks, max_products=0):
         else:
             print(f"Chunk {chunk_id}: products {start_idx + 1} to {end_idx} ({len(chunk_products)} rows)")
 
-        processed_names = set()
-        next_offset = start_idx if total_chunks > 0 else 0
-
-        for idx, meta in enumerate(chunk_products, start=1):
-            name_key = normalize_name_key(meta.get("product_name", ""))
-            if name_key and name_key in processed_names:
-                print(f"\nSkipping duplicate {idx}/{len(chunk_products)} - {meta.get('product_name', '')}")
-                continue
-
-            print(f"\nProcessing {idx}/{len(chunk_products)} - Offset: {next_offset} - Name: {meta.get('product_name', '')}")
-            result, next_offset = scrape_product_for_meta(
-                driver,
-                meta,
-                search_url,
-                start_offset=next_offset,
-                processed_names=processed_names,
-            )
-            processed_key = normalize_name_key(result.get("product_name", "")) or name_key
-            if processed_key:
-                processed_names.add(processed_key)
-            append_product_row(csv1_path, result)
-            append_seller_rows(csv2_path, result.get("competitors", []))
-            time.sleep(random.uniform(1.2, 2.4))
+        product_file, product_writer = open_csv_writer(csv1_path, PRODUCT_FIELDS)
+        seller_file, seller_writer = open_csv_writer(
+            csv2_path, SELLER_FIELDS, restval="", extrasaction="ignore"
+        )
+        with product_file, seller_file:
+            processed_cids = set()
+            next_offset = start_idx if total_chunks > 0 else 0
+
+            for idx, meta in enumerate(chunk_products, start=1):
+                cid = meta.get("cid", "")
+                if cid and cid in processed_cids:
+                    print(f"\nSkipping duplicate {idx}/{len(chunk_products)} - {meta.get('product_name', '')}")
+                    continue
+
+                print(f"\nProcessing {idx}/{len(chunk_products)} - Offset: {next_offset} - Name: {meta.get('product_name', '')}")
+                result, next_offset = scrape_product_for_meta(
+                    driver,
+                    meta,
+                    search_url,
+                    start_offset=next_offset,
+                    processed_cids=processed_cids,
+                )
+                processed_cid = result.get("cid", "") or cid
+                if processed_cid:
+                    processed_cids.add(processed_cid)
+                append_product_row(product_writer, result)
+                append_seller_rows(seller_writer, result.get("competitors", []))
 
         print(f"✓ Saved product info: {os.path.basename(csv1_path)}")
         print(f"✓ Saved seller info: {os.path.basename(csv2_path)}")
@@ -419,10 +534,11 @@ def process_keyword_chunk(keyword, chunk_id, total_chunks, max_products=0):
         traceback.print_exc()
         return False
     finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
+        if owns_driver:
+            try:
+                driver.quit()
+            except Exception:
+                pass
 
 
 def main():
@@ -430,17 +546,56 @@ def main():
     parser.add_argument("--chunk-id", type=int, default=1, help="Chunk ID (1-based)")
     parser.add_argument("--total-chunks", type=int, default=0, help="Total number of chunks (0 = all products)")
     parser.add_argument("--max-products", type=int, default=0, help="Maximum products to fetch (0 = no limit)")
-    parser.add_argument("--keyword", type=str, required=True, help="Keyword to search on Google Shopping")
+    parser.add_argument(
+        "--keyword", type=str, action="append", required=True,
+        help="Keyword to search on Google Shopping (repeat for several keywords in one browser)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Run chunks 1..N of N in N processes, one driver each (overrides --chunk-id/--total-chunks)",
+    )
     args = parser.parse_args()
 
     print("=" * 60)
     print("Google Shopping Keyword Scraper")
-    print(f"Chunk: {args.chunk_id} of {args.total_chunks}")
+    if args.workers > 1:
+        print(f"Workers: {args.workers} (chunks 1 to {args.workers})")
+    else:
+        print(f"Chunk: {args.chunk_id} of {args.total_chunks}")
     print(f"Max products: {args.max_products if args.max_products > 0 else 'no limit'}")
-    print(f"Keyword: {args.keyword}")
+    print(f"Keyword: {', '.join(args.keyword)}")
     print("=" * 60)
 
-    ok = process_keyword_chunk(args.keyword, args.chunk_id, args.total_chunks, args.max_products)
+    if args.workers > 1:
+        # Selenium drivers are not shareable, so each chunk gets its own process and browser
+        chunk_ids = range(1, args.workers + 1)
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            results = [
+                result
+                for keyword in args.keyword
+                for result in executor.map(
+                    process_keyword_chunk,
+                    repeat(keyword),
+                    chunk_ids,
+                    repeat(args.workers),
+                    repeat(args.max_products),
+                )
+            ]
+        ok = all(results)
+    else:
+        # One browser for every keyword: startup and profile creation happen once
+        driver = start_driver()
+        try:
+            results = [
+                process_keyword_chunk(keyword, args.chunk_id, args.total_chunks, args.max_products, driver=driver)
+                for keyword in args.keyword
+            ]
+        finally:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        ok = all(results)
     if ok:
         print("\n✓ Processing completed successfully")
         raise SystemExit(0)